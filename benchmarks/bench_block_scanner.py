@@ -0,0 +1,83 @@
+"""Time the index-driven file block scanner against the original regex on growing documents.
+
+Documents are built with format_file_content from synthetic files, some of which contain ```
+fence lines of their own. The scanner should take time proportional to document size;
+"regex wrong" counts the code blocks the regex cut short or merged with a neighbour.
+
+Run from the repository root:  python benchmarks/bench_block_scanner.py [--max-mb N] [--legacy-max-mb N]
+"""
+import argparse
+import io
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from repo_to_md.core import format_file_content, iter_file_sections, iter_streamed_sections
+
+def legacy_extract_file_blocks(markdown_text: str) -> list:
+    """The regex extract_file_blocks replaced, kept as the reference."""
+    blocks = []
+    pattern = r'### File: (.+?)(?:\s+\[Binary file - (\d+) bytes\])?\n(?:```(\w+)?\n(.*?)\n```|Binary content not shown|(?=### File:)|$)'
+    for match in re.finditer(pattern, markdown_text, re.DOTALL):
+        content = match.group(4) if match.group(4) else 'Binary content not shown'
+        blocks.append((match.group(1).strip(), content.strip()))
+    return blocks
+
+def build_document(target_bytes: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    words = ["def", "return", "value", "self", "import", "for", "in", "if", "else", "print"]
+    sections = ["# Repository: bench/docs\n## File Structure\n```\n📁 Root\n```\n\n"]
+    size, index = 0, 0
+    while size < target_bytes:
+        lines = [" ".join(rnd.choice(words) for _ in range(rnd.randint(2, 12))) for _ in range(rnd.randint(5, 200))]
+        if index % 5 == 0:
+            # Embedded fences, as in Markdown files or docstrings showing code
+            lines[len(lines) // 2:len(lines) // 2] = ["```python", "print('example')", "```"]
+        if index % 17 == 0:
+            sections.append(f"### File: assets/image{index}.png\n[Binary file - {rnd.randint(100, 10 ** 6)} bytes]\n\n")
+        section = format_file_content(f"src/module{index}.{'md' if index % 5 == 0 else 'py'}", "\n".join(lines).encode())
+        sections.append(section)
+        size += len(section)
+        index += 1
+    return "".join(sections)
+
+def best_of(func, rounds: int = 3) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-mb", type=int, default=64, help="largest document size, doubling from 1 MB")
+    parser.add_argument("--legacy-max-mb", type=int, default=8, help="largest size to also time the regex on")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'files':>7} {'scanner':>10} {'MB/s':>8} {'stream':>10} {'regex':>10} {'regex wrong':>12}")
+    megabytes = 1
+    while megabytes <= args.max_mb:
+        document = build_document(megabytes * 1024 * 1024)
+        sections = list(iter_file_sections(document))
+        encoded = document.encode('utf-8')
+        if list(iter_streamed_sections(io.BytesIO(encoded))) != sections:
+            print(f"MISMATCH between the string and stream parsers at {megabytes} MB")
+            return 1
+        scanner = best_of(lambda: list(iter_file_sections(document)))
+        stream = best_of(lambda: list(iter_streamed_sections(io.BytesIO(encoded))))
+        regex, regex_files = "-", "-"
+        if megabytes <= args.legacy_max_mb:
+            regex = f"{best_of(lambda: legacy_extract_file_blocks(document), rounds=1):9.3f}s"
+            expected = {(section['filename'], section['content'].strip()) for section in sections if section['language']}
+            regex_files = str(sum(block not in expected for block in legacy_extract_file_blocks(document) if not block[0].endswith('.png')))
+        print(f"{megabytes:>6}MB {len(sections):>7} {scanner:9.3f}s {len(encoded) / scanner / 1e6:8.1f} {stream:9.3f}s {regex:>10} {regex_files:>12}")
+        megabytes *= 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Check is_binary_content against the original heuristic on the sample corpus and time both.
+
+Run from the repository root:  python benchmarks/bench_classifier.py [--rounds N]
+"""
+import argparse
+import mimetypes
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from repo_to_md.core import TEXT_EXTENSIONS, TEXT_FILENAMES, classify_binary, is_binary_content
+
+CORPUS_DIR = Path(__file__).resolve().parent / "classifier_corpus"
+
+def legacy_is_binary_content(filename: str, content: bytes) -> bool:
+    """The per-byte Python implementation is_binary_content replaced, kept as the reference."""
+    if not content:
+        return False
+
+    file_path = Path(filename)
+    extension = file_path.suffix[1:].lower()
+
+    if extension in TEXT_EXTENSIONS or file_path.name.lower() in TEXT_FILENAMES:
+        return False
+
+    mime_type, _ = mimetypes.guess_type(filename)
+    if mime_type and mime_type.startswith('text/'):
+        return False
+
+    if content.startswith((b'\xef\xbb\xbf', b'\xfe\xff', b'\xff\xfe')):
+        return False
+
+    sample = content[:1024]
+    if b'\0' in sample:
+        return True
+
+    text_chars = set(bytes(range(32, 127)) + b'\n\r\t\f\b')
+    if len(sample) > 0:
+        non_text_ratio = sum(1 for byte in sample if byte not in text_chars) / len(sample)
+        if non_text_ratio > 0.30:
+            return True
+
+    try:
+        content.decode('utf-8')
+        return False
+    except UnicodeDecodeError:
+        return True
+
+def load_corpus() -> list:
+    return [(path.name, path.read_bytes()) for path in sorted(CORPUS_DIR.iterdir()) if path.is_file()]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000, help="passes over the corpus when timing")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    mismatches = []
+    batch = classify_binary(corpus)
+    for (name, content), batched in zip(corpus, batch):
+        expected = legacy_is_binary_content(name, content)
+        if is_binary_content(name, content) != expected or batched != expected:
+            mismatches.append(name)
+        print(f"{name:<24} {'binary' if expected else 'text'}")
+    if mismatches:
+        print(f"\nMISMATCH on {len(mismatches)} file(s): {', '.join(mismatches)}")
+        return 1
+
+    for label, classify in (("legacy", lambda: [legacy_is_binary_content(n, c) for n, c in corpus]),
+                            ("is_binary_content", lambda: [is_binary_content(n, c) for n, c in corpus]),
+                            ("classify_binary", lambda: classify_binary(corpus))):
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            classify()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<18} {elapsed * 1e6 / (args.rounds * len(corpus)):8.2f} us/file")
+    print(f"\nAll {len(corpus)} corpus files classify identically.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Check that `import repo_to_md` plus a local-only conversion stays within a fixed time budget.
+
+Each round starts a fresh interpreter, imports the package and converts a small synthetic
+directory (see synthetic.py). It times the import and the conversion, plus the whole process
+including interpreter startup. The run fails if the median import plus conversion exceeds
+--budget-ms, or if a local-only run loaded Flask, the Hugging Face client or requests.
+--top lists the slowest imports from ``python -X importtime``.
+
+Run from the repository root:  python benchmarks/bench_import.py [--rounds N] [--budget-ms MS] [--top N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import PROFILES, generate_repo
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Only the network and demo code paths need these
+DEFERRED_MODULES = ("flask", "huggingface_hub", "requests")
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import repo_to_md
+imported = time.perf_counter()
+document = repo_to_md.create_markdown_document(path=sys.argv[1])
+converted = time.perf_counter()
+assert document.startswith("# Directory:"), document[:200]
+print(json.dumps({
+    "import": imported - started,
+    "convert": converted - imported,
+    "loaded": sorted({name.split(".")[0] for name in sys.modules} & set(%r)),
+}))
+""" % (DEFERRED_MODULES,)
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    return env
+
+def write_repo(directory: Path) -> int:
+    files = generate_repo(PROFILES["small"])
+    for path, content in files.items():
+        target = directory / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+    return len(files)
+
+def slowest_imports(count: int) -> list:
+    """The `count` slowest imports made by ``import repo_to_md``, leaving out interpreter startup."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import repo_to_md"],
+                            env=child_env(), capture_output=True, text=True, check=True).stderr
+    rows, pending = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # A module is listed after everything it imported; one leading space marks a top-level import
+        pending.append((int(cumulative), name.rstrip()))
+        if not name.startswith("  "):
+            if name.strip() == "repo_to_md":
+                rows = pending
+            pending = []
+    return sorted(rows, reverse=True)[:count]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="limit for the median import plus conversion")
+    parser.add_argument("--top", type=int, default=0, help="also list this many of the slowest imports")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="repo_to_md-bench-") as directory:
+        file_count = write_repo(Path(directory))
+        runs = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", CHILD, directory], env=child_env(),
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append({**json.loads(output), "process": time.perf_counter() - started})
+
+    median = lambda key: statistics.median(run[key] for run in runs) * 1000
+    total = statistics.median(run["import"] + run["convert"] for run in runs) * 1000
+    print(f"{args.rounds} rounds, local directory of {file_count} files (median ms)")
+    print(f"  import repo_to_md   {median('import'):8.1f}")
+    print(f"  local conversion    {median('convert'):8.1f}")
+    print(f"  import + conversion {total:8.1f}   budget {args.budget_ms:.0f}")
+    print(f"  whole process       {median('process'):8.1f}   (includes interpreter startup)")
+
+    loaded = sorted({name for run in runs for name in run["loaded"]})
+    if args.top:
+        print(f"\nSlowest imports (cumulative microseconds):")
+        for cumulative, name in slowest_imports(args.top):
+            print(f"  {cumulative:>8}  {name}")
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"import + conversion took {total:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    if loaded:
+        failures.append(f"a local-only run loaded {', '.join(loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
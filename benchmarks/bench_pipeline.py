@@ -0,0 +1,208 @@
+"""End-to-end benchmark of document generation, reverse conversion and the demo routes.
+
+A synthetic repository (see synthetic.py) is served by the local stand-in (see standin.py), so
+no request leaves the machine and real rate limits are never touched. Each mode runs in a fresh
+process and reports wall time per stage, requests as seen by the scheduler and by the server,
+bytes fetched, and the process's peak RSS after each stage.
+
+Modes: "api" lists the tree and fetches files one by one, "archive" lists the tree and streams
+the tarball and "hf" goes through the Hugging Face listing. Document stages are split at the
+chunks the generator yields: "listing" runs until the header, "tree" covers the file tree, and
+"files" the sections after it (for "archive" that includes the download).
+
+Run from the repository root:
+  python benchmarks/bench_pipeline.py [--profile medium] [--modes api,archive,hf] [--latency-ms 20]
+                                      [--rate-limit N --reset-seconds S] [--throttle-every N] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from standin import StandInServer
+from synthetic import PROFILES, RepoProfile, generate_repo
+
+MODES = ("api", "archive", "hf")
+
+def peak_rss() -> int:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def point_at(base_url: str) -> None:
+    from huggingface_hub import constants
+    from repo_to_md import core
+    core.GITHUB_API = f"{base_url}/repos/"
+    core.GITHUB_RAW_URL = f"{base_url}/raw/"
+    core.HF_SPACES_URL = f"{base_url}/spaces/"
+    constants.ENDPOINT = base_url
+
+def demo_client():
+    """A test client for the demo app; run_demo registers the routes, so it is called with app.run disabled."""
+    from repo_to_md import demo
+    demo.app.run = lambda **kwargs: None
+    demo.run_demo()
+    return demo.app.test_client()
+
+def run_mode(base_url: str, mode: str, workers: int, flask: bool, results) -> None:
+    """Run one mode in this (fresh) process and put its measurements on `results`."""
+    from repo_to_md import core
+    point_at(base_url)
+    url = "https://huggingface.co/spaces/bench/repo" if mode == "hf" else "https://github.com/bench/repo"
+    result = {"mode": mode, "stages": {}, "rss": {"start": peak_rss()}, "error": None}
+
+    def stage(name: str, started: float) -> float:
+        now = time.perf_counter()
+        result["stages"][name] = now - started
+        result["rss"][name] = peak_rss()
+        return now
+
+    files = [0]
+    chunks = []
+    started = time.perf_counter()
+    for position, chunk in enumerate(core.iter_markdown_document(url, archive=mode == "archive", max_workers=workers,
+                                                                 progress=lambda done, total: files.__setitem__(0, done))):
+        if position == 0:
+            if chunk.startswith("Error:"):
+                result["error"] = chunk
+                results.put(result)
+                return
+            started = stage("listing", started)
+        elif position == 2:
+            started = stage("tree", started)
+        chunks.append(chunk)
+    stage("files", started)
+    document = "".join(chunks)
+    result["files"] = files[0]
+    result["document_bytes"] = len(document.encode('utf-8'))
+    result["scheduler"] = core.get_scheduler().stats()
+
+    started = time.perf_counter()
+    parsed, _ = core.markdown_to_files(document)
+    stage("markdown_to_files", started)
+    result["parsed_files"] = len(parsed) if isinstance(parsed, list) else 0
+
+    if flask:
+        try:
+            client = demo_client()
+        except ImportError as e:
+            result["flask_error"] = str(e)
+        else:
+            routes = {}
+            started = time.perf_counter()
+            routes["POST /process"] = client.post("/process", json={"repo_url": url, "archive": mode == "archive"}).status_code
+            started = stage("route /process", started)
+            routes["POST /reverse"] = client.post("/reverse", data={"markdown_text": document}).status_code
+            started = stage("route /reverse", started)
+            response = client.post("/download_extracted")
+            response.get_data()
+            routes["POST /download_extracted"] = response.status_code
+            stage("route /download_extracted", started)
+            result["routes"] = routes
+    results.put(result)
+
+def format_bytes(count: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+def print_result(result: dict, wall: float, server_counts: dict) -> None:
+    print(f"\n== {result['mode']}  ({wall:.2f}s wall)")
+    if result["error"]:
+        print(f"   {result['error']}")
+        return
+    print(f"   {result['files']} files -> {format_bytes(result['document_bytes'])} document, "
+          f"{result['parsed_files']} files parsed back")
+    scheduler = result["scheduler"]
+    print(f"   scheduler: {scheduler['requests']} requests, {scheduler['retries']} retries, {scheduler['throttled']} throttled, "
+          f"{scheduler['not_modified']} not modified, {format_bytes(scheduler['bytes'])} fetched")
+    print("   server, all stages: " + ", ".join(f"{kind} {count}" for kind, count in sorted(server_counts.items())))
+    print(f"   {'stage':<28}{'seconds':>10}{'peak RSS':>14}")
+    print(f"   {'start':<28}{'':>10}{format_bytes(result['rss']['start']):>14}")
+    for name, seconds in result["stages"].items():
+        print(f"   {name:<28}{seconds:>10.3f}{format_bytes(result['rss'][name]):>14}")
+    if "routes" in result:
+        print("   routes:    " + ", ".join(f"{route} {status}" for route, status in result["routes"].items()))
+    elif "flask_error" in result:
+        print(f"   routes skipped: {result['flask_error']}")
+
+def wait_for_result(process: multiprocessing.process.BaseProcess, results) -> Optional[dict]:
+    """The mode's result, or None if its process died without putting one."""
+    while True:
+        try:
+            return results.get(timeout=1.0)
+        except queue.Empty:
+            if not process.is_alive():
+                break
+    # A result put just before the process exited may still be in the pipe
+    try:
+        return results.get(timeout=1.0)
+    except queue.Empty:
+        return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="medium")
+    parser.add_argument("--files", type=int, help="override the profile's file count")
+    parser.add_argument("--mean-bytes", type=int, help="override the profile's typical file size")
+    parser.add_argument("--binary-fraction", type=float, help="override the profile's share of binary files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--workers", type=int, default=8, help="max_workers for file fetches")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every response")
+    parser.add_argument("--rate-limit", type=int, help="API requests allowed per window")
+    parser.add_argument("--reset-seconds", type=float, default=60.0, help="length of the rate-limit window")
+    parser.add_argument("--throttle-every", type=int, help="refuse every Nth raw file request with 429")
+    parser.add_argument("--skip-flask", action="store_true", help="do not time the demo routes")
+    parser.add_argument("--json", action="store_true", help="print the measurements as JSON")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    profile = RepoProfile(
+        files=args.files or profile.files,
+        mean_bytes=args.mean_bytes or profile.mean_bytes,
+        binary_fraction=profile.binary_fraction if args.binary_fraction is None else args.binary_fraction,
+        max_depth=profile.max_depth,
+    )
+    files = generate_repo(profile, args.seed)
+    if not args.json:
+        print(f"Synthetic repository: {len(files)} files, {format_bytes(sum(map(len, files.values())))} "
+              f"({args.profile}, {profile.binary_fraction:.0%} binary)")
+
+    # A fresh interpreter per mode keeps peak RSS and connection state from leaking between modes
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    failed = False
+    with StandInServer(files, latency=args.latency_ms / 1000, rate_limit=args.rate_limit, reset_seconds=args.reset_seconds,
+                       throttle_every=args.throttle_every) as server:
+        for mode in args.modes.split(","):
+            server.reset_counts()
+            results = context.Queue()
+            started = time.perf_counter()
+            process = context.Process(target=run_mode, args=(server.base_url, mode, args.workers, not args.skip_flask, results))
+            process.start()
+            result = wait_for_result(process, results)
+            process.join()
+            wall = time.perf_counter() - started
+            if result is None:
+                failed = True
+                result = {"mode": mode, "error": f"Mode process exited with code {process.exitcode} before reporting a result"}
+            reports.append({**result, "wall": wall, "server": dict(server.counts)})
+            if not args.json:
+                print_result(result, wall, dict(server.counts))
+    if args.json:
+        print(json.dumps({"profile": profile._asdict(), "results": reports}, indent=2))
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Local stand-in for the GitHub and Hugging Face endpoints repo_to_md calls.
+
+Serves one repository, whatever owner and name are asked for:
+
+  /repos/{owner}/{repo}                          repository info (default branch "main")
+  /repos/{owner}/{repo}/branches/main            head commit and tree
+  /repos/{owner}/{repo}/commits/HEAD             head commit SHA as plain text
+  /repos/{owner}/{repo}/compare/{base}...{head}  status and changed files, at most 300
+  /repos/{owner}/{repo}/git/trees/{sha}          recursive tree listing
+  /repos/{owner}/{repo}/tarball/{ref}            gzipped tarball
+  /raw/{owner}/{repo}/main/{path}                raw file contents, honouring Range
+  /api/spaces/{owner}/{repo}/tree/main           Hugging Face listing, paginated with Link headers
+  /spaces/{owner}/{repo}/raw/main/{path}         Hugging Face raw file contents
+
+API responses carry ETags and answer If-None-Match with 304. Every response can be delayed by
+`latency` seconds. With `rate_limit`, API requests draw on a quota of that many per
+`reset_seconds` window, reported through X-RateLimit-* headers, and are refused with 403 once it
+is spent. With `throttle_every`, every Nth raw file request is refused with 429 and Retry-After.
+
+The repository starts at commit "c0ffee"; push() commits new contents on top of it, or replaces
+the head commit with ``force=True``. Raw files are always served from the head commit.
+"""
+import hashlib
+import io
+import json
+import tarfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# GitHub lists at most this many files in a comparison
+COMPARE_FILES = 300
+
+def blob_sha(content: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+def tree_entries(files: Dict[str, bytes]) -> List[Dict]:
+    return [{"path": path, "mode": "100644", "type": "blob", "sha": blob_sha(content), "size": len(content)}
+            for path, content in files.items()]
+
+def build_tarball(files: Dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz', compresslevel=1) as archive:
+        for path, content in files.items():
+            info = tarfile.TarInfo(f"owner-repo-c0ffee/{path}")
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+def tree_sha(commit: str) -> str:
+    return "7ree" + commit[len("c0ffee"):]
+
+class StandInServer:
+    def __init__(self, files: Dict[str, bytes], latency: float = 0.0, rate_limit: Optional[int] = None,
+                 reset_seconds: float = 60.0, throttle_every: Optional[int] = None, retry_after: int = 0,
+                 hf_page_size: int = 1000):
+        self.files = files
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.reset_seconds = reset_seconds
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.hf_page_size = hf_page_size
+        self.counts = Counter()
+        # Raw file requests by path
+        self.raw_counts = Counter()
+        self._lock = threading.Lock()
+        self._window_end = time.time() + reset_seconds
+        self._remaining = rate_limit
+        self._raw_requests = 0
+        self.head = "c0ffee"
+        self._commits = {self.head: (None, files)}
+        self._tree = tree_entries(files)
+        self._trees = {self.head: self._tree}
+        # Built on first request, by commit; an entry may be replaced to serve a different tarball
+        self.tarballs = {}
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "StandInServer":
+        server = self
+
+        class Handler(StandInHandler):
+            stand_in = server
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.counts.clear()
+            self.raw_counts.clear()
+
+    def push(self, files: Dict[str, bytes], force: bool = False) -> str:
+        """Make `files` the head of the default branch and return the new commit's SHA.
+
+        A force push replaces the head commit instead of building on it, so the old head is no
+        longer an ancestor of the new one and comparing them reports "diverged".
+        """
+        with self._lock:
+            parent = self._commits[self.head][0] if force else self.head
+            self.head = f"c0ffee{len(self._commits)}"
+            self._commits[self.head] = (parent, files)
+            self.files = files
+            self._tree = self._trees[self.head] = tree_entries(files)
+            return self.head
+
+    def _ancestors(self, commit: str) -> List[str]:
+        ancestors = []
+        while commit is not None:
+            ancestors.append(commit)
+            commit = self._commits[commit][0]
+        return ancestors
+
+    def tree(self, tree: str) -> Optional[List[Dict]]:
+        with self._lock:
+            return self._trees.get("c0ffee" + tree[len("7ree"):]) if tree.startswith("7ree") else None
+
+    def compare(self, base: str, head: str) -> Optional[Dict]:
+        """The compare API's view of `base`...`head`, or None if either commit is unknown."""
+        with self._lock:
+            if base not in self._commits or head not in self._commits:
+                return None
+            if base == head:
+                status = "identical"
+            elif base in self._ancestors(head):
+                status = "ahead"
+            elif head in self._ancestors(base):
+                status = "behind"
+            else:
+                status = "diverged"
+            old, new = self._commits[base][1], self._commits[head][1]
+        files = [{"filename": path, "status": "removed"} for path in old if path not in new]
+        files += [{"filename": path, "status": "added" if path not in old else "modified"}
+                  for path, content in new.items() if old.get(path) != content]
+        files.sort(key=lambda item: item["filename"])
+        return {"status": status, "total_commits": 1, "files": files[:COMPARE_FILES]}
+
+    def count(self, kind: str) -> None:
+        with self._lock:
+            self.counts[kind] += 1
+
+    def take_quota(self) -> tuple:
+        """Charge one API request; returns (allowed, remaining, reset epoch)."""
+        with self._lock:
+            now = time.time()
+            if now >= self._window_end:
+                self._window_end = now + self.reset_seconds
+                self._remaining = self.rate_limit
+            if self.rate_limit is None:
+                return True, None, int(self._window_end)
+            if self._remaining <= 0:
+                return False, 0, int(self._window_end) + 1
+            self._remaining -= 1
+            return True, self._remaining, int(self._window_end) + 1
+
+    def take_raw(self) -> bool:
+        """Whether this raw file request should be throttled."""
+        with self._lock:
+            self._raw_requests += 1
+            return bool(self.throttle_every) and self._raw_requests % self.throttle_every == 0
+
+    def tarball(self, ref: str = "main") -> Optional[bytes]:
+        with self._lock:
+            commit = self.head if ref == "main" else ref
+            if commit not in self._commits:
+                return None
+            if commit not in self.tarballs:
+                self.tarballs[commit] = build_tarball(self._commits[commit][1])
+            return self.tarballs[commit]
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, each response waits on a delayed ACK
+    disable_nagle_algorithm = True
+    stand_in = None
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send(self, status: int, body: bytes = b"", content_type: str = 'application/json', headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_api(self, kind: str, payload, headers: Optional[Dict[str, str]] = None) -> None:
+        allowed, remaining, reset = self.stand_in.take_quota()
+        quota = {} if remaining is None else {'X-RateLimit-Limit': str(self.stand_in.rate_limit),
+                                              'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Reset': str(reset)}
+        if not allowed:
+            self.stand_in.count("rate_limited")
+            return self.send(403, b'{"message": "API rate limit exceeded"}', headers=quota)
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self.stand_in.count(kind)
+        if self.headers.get('If-None-Match') == etag:
+            self.stand_in.count("not_modified")
+            return self.send(304, headers={'ETag': etag, **quota})
+        self.send(200, body, headers={'ETag': etag, **quota, **(headers or {})})
+
+    def send_raw(self, path: str) -> None:
+        content = self.stand_in.files.get(path)
+        if content is None:
+            return self.send(404, b'Not Found', 'text/plain')
+        if self.stand_in.take_raw():
+            self.stand_in.count("throttled")
+            return self.send(429, b'Too Many Requests', 'text/plain', {'Retry-After': str(self.stand_in.retry_after)})
+        self.stand_in.count("raw")
+        with self.stand_in._lock:
+            self.stand_in.raw_counts[path] += 1
+        byte_range = self.headers.get('Range')
+        if byte_range and byte_range.startswith('bytes='):
+            start, _, end = byte_range[len('bytes='):].partition('-')
+            part = content[int(start):int(end) + 1]
+            return self.send(206, part, 'application/octet-stream',
+                             {'Content-Range': f"bytes {start}-{int(start) + len(part) - 1}/{len(content)}"})
+        self.send(200, content, 'application/octet-stream')
+
+    def send_hf_tree(self, query: Dict) -> None:
+        offset = int(query.get('cursor', ['0'])[0])
+        page_size = self.stand_in.hf_page_size
+        items = [{"type": "file", "path": item["path"], "size": item["size"], "oid": item["sha"]}
+                 for item in self.stand_in._tree[offset:offset + page_size]]
+        headers = {}
+        if offset + page_size < len(self.stand_in._tree):
+            next_url = f"{self.stand_in.base_url}{urlsplit(self.path).path}?recursive=True&cursor={offset + page_size}"
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        self.stand_in.count("hf_tree")
+        self.send(200, json.dumps(items).encode(), headers=headers)
+
+    def do_GET(self) -> None:
+        if self.stand_in.latency:
+            time.sleep(self.stand_in.latency)
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.split('/')[1:]]
+        if parts[:1] == ['repos'] and len(parts) >= 3:
+            rest = parts[3:]
+            if not rest:
+                return self.send_api("repo", {"default_branch": "main"})
+            head = self.stand_in.head
+            if rest == ['branches', 'main']:
+                return self.send_api("branch", {"commit": {"sha": head, "commit": {"tree": {"sha": tree_sha(head)}}}})
+            if rest == ['commits', 'HEAD']:
+                return self.send_api("head", head.encode())
+            if rest[:1] == ['compare'] and len(rest) == 2:
+                base, _, compared = rest[1].partition('...')
+                comparison = self.stand_in.compare(base, compared)
+                if comparison is not None:
+                    return self.send_api("compare", comparison)
+            if rest[:2] == ['git', 'trees'] and len(rest) == 3:
+                tree = self.stand_in.tree(rest[2])
+                if tree is not None:
+                    return self.send_api("tree", {"sha": rest[2], "tree": tree, "truncated": False})
+            if rest[:1] == ['tarball'] and len(rest) == 2:
+                tarball = self.stand_in.tarball(rest[1])
+                if tarball is not None:
+                    self.stand_in.count("tarball")
+                    return self.send(200, tarball, 'application/x-gzip')
+        if parts[:1] == ['raw'] and len(parts) > 4:
+            return self.send_raw("/".join(parts[4:]))
+        if parts[:2] == ['api', 'spaces'] and parts[4:6] == ['tree', 'main']:
+            return self.send_hf_tree(parse_qs(url.query))
+        if parts[:1] == ['spaces'] and parts[3:5] == ['raw', 'main']:
+            return self.send_raw("/".join(parts[5:]))
+        self.send(404, b'{"message": "Not Found"}')
@@ -0,0 +1,80 @@
+"""Deterministic synthetic repositories for the benchmarks.
+
+generate_repo returns {path: content} for a profile: how many files, their typical size, the
+share of binaries and how deep the directories go. A root .gitignore and a few files it
+excludes are always included so exclusion handling is exercised too.
+"""
+import math
+import random
+import struct
+import zlib
+from typing import Dict, NamedTuple
+
+class RepoProfile(NamedTuple):
+    files: int
+    mean_bytes: int
+    binary_fraction: float
+    max_depth: int
+
+PROFILES = {
+    "small": RepoProfile(files=50, mean_bytes=2 * 1024, binary_fraction=0.05, max_depth=2),
+    "medium": RepoProfile(files=1000, mean_bytes=4 * 1024, binary_fraction=0.1, max_depth=4),
+    "large": RepoProfile(files=10000, mean_bytes=4 * 1024, binary_fraction=0.1, max_depth=6),
+    "binary-heavy": RepoProfile(files=500, mean_bytes=64 * 1024, binary_fraction=0.6, max_depth=3),
+}
+
+WORDS = ["def", "return", "value", "self", "import", "for", "in", "if", "else", "print", "class", "data", "items", "result"]
+TEXT_KINDS = ["py", "py", "js", "md", "txt", "json", "html", "css"]
+BINARY_KINDS = ["png", "bin", "pt", "zip"]
+
+def text_file(rnd: random.Random, kind: str, size: int) -> bytes:
+    if kind == "json":
+        items, length = [], 2
+        while length < size:
+            item = {"id": len(items), "name": " ".join(rnd.choice(WORDS) for _ in range(3))}
+            items.append(item)
+            length += 40
+        return (str(items).replace("'", '"')).encode()
+    lines, length = [], 0
+    while length < size:
+        line = "    " * rnd.randint(0, 3) + " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 12)))
+        if kind == "md" and rnd.random() < 0.05:
+            # Fenced examples inside Markdown, as in real READMEs
+            line = "```python\nprint('example')\n```"
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines).encode()
+
+def binary_file(rnd: random.Random, kind: str, size: int) -> bytes:
+    body = rnd.getrandbits(8 * size).to_bytes(size, 'little') if size else b""
+    if kind == "png":
+        header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">IIBBBBB", 16, 16, 8, 2, 0, 0, 0)
+        return header + struct.pack(">I", zlib.crc32(header[12:])) + body
+    return body
+
+def file_size(rnd: random.Random, mean_bytes: int) -> int:
+    # Log-normal sizes: mostly small files with a long tail of large ones
+    return max(1, int(rnd.lognormvariate(math.log(mean_bytes) - 0.5, 1.0)))
+
+def generate_repo(profile: RepoProfile, seed: int = 0) -> Dict[str, bytes]:
+    rnd = random.Random(seed)
+    directories = [""]
+    for index in range(max(1, profile.files // 20)):
+        parent = rnd.choice(directories)
+        if parent.count("/") + 1 < profile.max_depth:
+            directories.append(f"{parent}dir{index}/")
+
+    files = {".gitignore": b"build/\n*.log\n"}
+    for name in ("build/output.js", "debug.log"):
+        files[name] = b"ignored\n"
+    while len(files) < profile.files:
+        index = len(files)
+        directory = rnd.choice(directories)
+        size = file_size(rnd, profile.mean_bytes)
+        if rnd.random() < profile.binary_fraction:
+            kind = rnd.choice(BINARY_KINDS)
+            files[f"{directory}blob{index}.{kind}"] = binary_file(rnd, kind, size)
+        else:
+            kind = rnd.choice(TEXT_KINDS)
+            files[f"{directory}file{index}.{kind}"] = text_file(rnd, kind, size)
+    return dict(sorted(files.items()))
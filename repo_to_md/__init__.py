@@ -1,10 +1,18 @@
-from .core import create_markdown_document, generate_file_tree
+from importlib.util import find_spec
+
+from .cache import BlobCache
+from .core import create_markdown_document, iter_markdown_document, refresh_markdown_document, generate_file_tree
 
 __version__ = "0.1.0"
-__all__ = ["create_markdown_document", "generate_file_tree"]
+__all__ = ["BlobCache", "create_markdown_document", "iter_markdown_document", "refresh_markdown_document", "generate_file_tree"]
 
-try:
-    from .demo import run_demo  # Optional import for demo
+# The demo is only offered when Flask is installed
+if find_spec("flask") is not None:
     __all__.append("run_demo")
-except ImportError:
-    pass  # Demo not available if Flask/markdown not installed
+
+def __getattr__(name):
+    # The demo builds its Flask app on import, so it is only loaded once run_demo is asked for
+    if name == "run_demo":
+        from .demo import run_demo
+        return run_demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
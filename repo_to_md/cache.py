@@ -0,0 +1,149 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "repo_to_md", "blobs")
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+def git_blob_sha(content: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+class BlobCache:
+    """Persistent content-addressed store of file contents keyed by Git blob SHA.
+
+    Entries are evicted least-recently-used first once the cache grows past `max_bytes`.
+    Recency survives restarts through the files' modification times, and writes are atomic
+    so several processes can share one directory. Each process only sees the others' writes
+    when it scans the directory, which it does on first use and again after every
+    `rescan_bytes` (by default a sixteenth of `max_bytes`) it writes itself; processes sharing a
+    directory can therefore take it past `max_bytes` by up to `rescan_bytes` each.
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None, max_bytes: int = DEFAULT_CACHE_BYTES, rescan_bytes: Optional[int] = None):
+        self.directory = Path(directory or os.getenv('REPO_TO_MD_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.rescan_bytes = max_bytes // 16 if rescan_bytes is None else rescan_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = None
+        self._total_bytes = 0
+        self._written = 0
+
+    def _path(self, sha: str) -> Path:
+        return self.directory / sha[:2] / sha[2:]
+
+    def _scan(self) -> OrderedDict:
+        """Rebuild the entries from the directory, oldest first, and evict down to `max_bytes`; call with the lock held."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for shard in self.directory.iterdir():
+            if not shard.is_dir() or len(shard.name) != 2:
+                continue
+            for entry in shard.iterdir():
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Evicted by another process meanwhile
+                    continue
+                found.append((stat.st_mtime, shard.name + entry.name, stat.st_size))
+        self._entries = OrderedDict((sha, size) for _, sha, size in sorted(found))
+        self._total_bytes = sum(self._entries.values())
+        self._written = 0
+        self._evict()
+        return self._entries
+
+    def _loaded(self) -> OrderedDict:
+        # The directory is only scanned once the cache is used, so processes that never touch it skip the stat calls
+        return self._entries if self._entries is not None else self._scan()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            sha, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._path(sha).unlink()
+            except OSError:
+                pass
+
+    def get(self, sha: str) -> Optional[bytes]:
+        with self._lock:
+            entries = self._loaded()
+            if sha not in entries:
+                self.misses += 1
+                return None
+            entries.move_to_end(sha)
+        path = self._path(sha)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            # Evicted by another process sharing the directory
+            with self._lock:
+                size = self._entries.pop(sha, None)
+                if size is not None:
+                    self._total_bytes -= size
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, sha: str, content: bytes) -> bool:
+        """Store `content` under `sha`; contents that do not hash to `sha` or exceed the cache size are skipped."""
+        if len(content) > self.max_bytes or git_blob_sha(content) != sha:
+            return False
+        with self._lock:
+            entries = self._loaded()
+            if sha in entries:
+                entries.move_to_end(sha)
+                return True
+        path = self._path(sha)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
+        with self._lock:
+            if sha not in self._entries:
+                self._entries[sha] = len(content)
+                self._total_bytes += len(content)
+                self._written += len(content)
+                if self._written >= self.rescan_bytes:
+                    # Pick up what other processes wrote before deciding what to evict
+                    self._scan()
+                else:
+                    self._evict()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries or ()),
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for sha in self._loaded():
+                try:
+                    self._path(sha).unlink()
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
@@ -0,0 +1,213 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from . import core
+from .cache import BlobCache
+from .core import DEFAULT_MAX_WORKERS, LOCAL_MAX_WORKERS, get_scheduler, iter_markdown_document
+
+# Set in each batch worker process by init_worker and reused for every repository it builds
+_worker_cache = None
+_worker_cache_dir = None
+_worker_use_cache = False
+_worker_options = None
+
+def is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+def read_manifest(lines: Iterator[str]) -> List[str]:
+    """Sources listed one per line; blank lines and lines starting with "#" are skipped."""
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith('#')]
+
+def output_name(source: str) -> str:
+    if is_url(source):
+        owner, repo = source.rstrip('/').split('/')[-2:]
+        return f"{owner}_{repo}_summary.md"
+    return f"{Path(source).resolve().name}_summary.md"
+
+def output_names(sources: List[str]) -> List[str]:
+    """One output filename per source, numbered where two sources would otherwise collide."""
+    names, seen = [], {}
+    for source in sources:
+        name = output_name(source)
+        count = seen.get(name, 0) + 1
+        seen[name] = count
+        names.append(name if count == 1 else f"{name[:-3]}_{count}.md")
+    return names
+
+def build_options(args: argparse.Namespace) -> Dict:
+    return {
+        "max_workers": args.max_workers,
+        "archive": args.archive,
+        "max_file_bytes": args.max_file_bytes,
+        "max_total_bytes": args.max_total_bytes,
+        "exclude": args.exclude,
+        "use_gitignore": not args.no_gitignore,
+        "tree_max_depth": args.tree_max_depth,
+        "tree_max_entries": args.tree_max_entries,
+    }
+
+def open_cache(args: argparse.Namespace) -> Optional[BlobCache]:
+    return None if args.no_cache else BlobCache(args.cache_dir)
+
+def iter_source_document(source: str, options: Dict, cache: Optional[BlobCache] = None, revision: Optional[str] = None, progress=None) -> Iterator[str]:
+    if is_url(source):
+        return iter_markdown_document(source, cache=cache, progress=progress, **options)
+    options = {key: value for key, value in options.items() if key != 'archive'}
+    return iter_markdown_document(path=source, revision=revision, progress=progress, **options)
+
+def write_document(chunks: Iterator[str], output: Path) -> int:
+    """Write a document to `output` via a temporary file; raises RuntimeError with the build's error, if any."""
+    partial = output.with_name(f".{output.name}.partial")
+    written = 0
+    try:
+        with open(partial, 'w', encoding='utf-8') as file:
+            for chunk in chunks:
+                if not written and chunk.startswith("Error:"):
+                    raise RuntimeError(chunk[len("Error:"):].strip())
+                written += file.write(chunk)
+        os.replace(partial, output)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return output.stat().st_size
+
+def init_worker(cache_dir: Optional[str], use_cache: bool, options: Dict) -> None:
+    global _worker_cache_dir, _worker_use_cache, _worker_options
+    _worker_cache_dir, _worker_use_cache = cache_dir, use_cache
+    _worker_options = options
+
+def worker_cache() -> Optional[BlobCache]:
+    """This worker's blob cache, opened when a URL first needs it; local paths never read it."""
+    global _worker_cache
+    if _worker_cache is None and _worker_use_cache:
+        # The cache directory is shared by every worker: blob writes are atomic renames
+        _worker_cache = BlobCache(_worker_cache_dir)
+    return _worker_cache
+
+def scheduler_stats(source: str) -> Optional[Dict[str, int]]:
+    # Local builds never create the scheduler, and creating one just to read it would import requests
+    if is_url(source) or core._scheduler is not None:
+        return get_scheduler().stats()
+    return None
+
+def build_one(source: str, output: str, revision: Optional[str] = None) -> Dict:
+    """Build one manifest entry in a worker process and report what it cost."""
+    files = [0]
+    cache = worker_cache() if is_url(source) else None
+    before = scheduler_stats(source)
+    cache_before = cache.stats() if cache else None
+    started = time.perf_counter()
+    result = {"source": source, "output": output, "error": None, "files": 0, "bytes_written": 0}
+    try:
+        chunks = iter_source_document(source, _worker_options, cache, revision,
+                                      progress=lambda done, total: files.__setitem__(0, done))
+        result["bytes_written"] = write_document(chunks, Path(output))
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - started
+    result["files"] = files[0]
+    after = scheduler_stats(source)
+    result["requests"] = after["requests"] - before["requests"] if before else 0
+    result["bytes_fetched"] = after["bytes"] - before["bytes"] if before else 0
+    if cache_before is not None:
+        cache_after = cache.stats()
+        result["cache_hits"] = cache_after["hits"] - cache_before["hits"]
+        result["cache_misses"] = cache_after["misses"] - cache_before["misses"]
+    return result
+
+def format_bytes(count: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+def print_summary(results: List[Dict], seconds: float, stream=sys.stderr) -> None:
+    failed = [result for result in results if result["error"]]
+    total = lambda key: sum(result.get(key, 0) for result in results)
+    print(f"\n{len(results) - len(failed)} of {len(results)} repositories converted in {seconds:.1f}s "
+          f"({len(results) / seconds if seconds else 0:.2f} repos/s, {total('files') / seconds if seconds else 0:.0f} files/s)", file=stream)
+    print(f"Files: {total('files')}  Written: {format_bytes(total('bytes_written'))}  "
+          f"Fetched: {format_bytes(total('bytes_fetched'))} in {total('requests')} requests  "
+          f"Cache: {total('cache_hits')} hits, {total('cache_misses')} misses", file=stream)
+    for result in failed:
+        print(f"FAILED {result['source']}: {result['error']}", file=stream)
+
+def run_batch(args: argparse.Namespace) -> int:
+    with (sys.stdin if args.manifest == '-' else open(args.manifest, encoding='utf-8')) as manifest:
+        sources = read_manifest(manifest)
+    if not sources:
+        print("No sources listed in the manifest.", file=sys.stderr)
+        return 1
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = [str(output_dir / name) for name in output_names(sources)]
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker,
+                             initargs=(args.cache_dir, not args.no_cache, build_options(args))) as executor:
+        futures = [executor.submit(build_one, source, output, args.revision) for source, output in zip(sources, outputs)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = f"FAILED ({result['error']})" if result['error'] else f"{result['files']} files, {format_bytes(result['bytes_written'])}"
+            print(f"[{len(results)}/{len(sources)}] {result['source']}: {status} in {result['seconds']:.1f}s", file=sys.stderr)
+    print_summary(results, time.perf_counter() - started)
+    return 1 if any(result['error'] for result in results) else 0
+
+def run_convert(args: argparse.Namespace) -> int:
+    cache = open_cache(args) if is_url(args.source) else None
+    chunks = iter_source_document(args.source, build_options(args), cache, args.revision)
+    try:
+        if args.output:
+            write_document(chunks, Path(args.output))
+        else:
+            for done, chunk in enumerate(chunks):
+                if not done and chunk.startswith("Error:"):
+                    raise RuntimeError(chunk[len("Error:"):].strip())
+                sys.stdout.write(chunk)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def add_document_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--revision", help="for local paths, read this Git revision instead of the working tree")
+    parser.add_argument("--max-workers", type=int, help=f"concurrent file reads per source (default: {DEFAULT_MAX_WORKERS} for URLs, {LOCAL_MAX_WORKERS} for local paths)")
+    parser.add_argument("--archive", action="store_true", help="download GitHub repositories as one tarball")
+    parser.add_argument("--max-file-bytes", type=int, help="truncate text files after this many bytes")
+    parser.add_argument("--max-total-bytes", type=int, help="skip file contents once a document reaches this many bytes")
+    parser.add_argument("--exclude", action="append", metavar="PATTERN", help="gitignore-style pattern to leave out (repeatable)")
+    parser.add_argument("--no-gitignore", action="store_true", help="do not honour the repository's .gitignore files")
+    parser.add_argument("--tree-max-depth", type=int, help="collapse the file tree below this depth")
+    parser.add_argument("--tree-max-entries", type=int, help="collapse directories after this many entries")
+    parser.add_argument("--cache-dir", help="blob cache directory (default: ~/.cache/repo_to_md/blobs)")
+    parser.add_argument("--no-cache", action="store_true", help="do not cache downloaded files")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="repo_to_md", description="Convert repositories and directories into single Markdown documents.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert one GitHub/Hugging Face URL or local path")
+    convert.add_argument("source", help="repository URL or local directory")
+    convert.add_argument("-o", "--output", help="output file (default: standard output)")
+    add_document_options(convert)
+    convert.set_defaults(run=run_convert)
+
+    batch = commands.add_parser("batch", help="convert every source listed in a manifest on a process pool")
+    batch.add_argument("manifest", help="file listing one URL or local path per line ('-' for standard input)")
+    batch.add_argument("-o", "--output-dir", default=".", help="directory for the documents (default: current directory)")
+    batch.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="repositories converted at once (default: CPU count)")
+    add_document_options(batch)
+    batch.set_defaults(run=run_batch)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.run(args)
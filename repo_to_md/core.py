@@ -1,14 +1,41 @@
-import requests
-import base64
+import codecs
+import functools
+import io
 import json
 import mimetypes
+import mmap
 import os
-from huggingface_hub import HfApi
+import subprocess
+import tarfile
+import threading
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import re
-from typing import List, Tuple, Dict, Optional, Union
+from typing import IO, AnyStr, TYPE_CHECKING, Callable, Iterable, Iterator, List, Tuple, Dict, Optional, Union
+from .cache import BlobCache
+from .ignore import PathMatcher
+from . import metrics
+from .local import GitObjectReader, iter_local_files, list_git_tree
+
+# requests (and the scheduler built on it) is imported on first use, so local-only runs never load it
+if TYPE_CHECKING:
+    import requests
+    from .scheduler import RequestScheduler
 
 GITHUB_API = "https://api.github.com/repos/"
+GITHUB_RAW_URL = "https://raw.githubusercontent.com/"
+HF_SPACES_URL = "https://huggingface.co/spaces/"
+
+DEFAULT_MAX_WORKERS = 8
+# Local files are read from the page cache; extra threads measured no faster, so they are read serially by default
+LOCAL_MAX_WORKERS = 1
+# GitHub lists at most this many files in a comparison
+COMPARE_FILE_LIMIT = 300
+# Local files are read in batches of this many files or bytes per worker task
+LOCAL_BATCH_FILES = 64
+LOCAL_BATCH_BYTES = 4 * 1024 * 1024
 
 TEXT_EXTENSIONS = {
     'py', 'md', 'txt', 'js', 'html', 'css', 'json', 'toml', 'yaml', 'yml',
@@ -18,6 +45,16 @@ TEXT_EXTENSIONS = {
     'r', 'ps1', 'svg'
 }
 
+# Extensions listed as binary from their size alone, without downloading them
+BINARY_EXTENSIONS = {
+    'png', 'jpg', 'jpeg', 'gif', 'bmp', 'ico', 'webp', 'tif', 'tiff', 'pdf',
+    'zip', 'gz', 'tgz', 'bz2', 'xz', '7z', 'rar', 'tar', 'whl', 'jar', 'egg',
+    'bin', 'pt', 'pth', 'ckpt', 'safetensors', 'onnx', 'h5', 'hdf5', 'pb', 'tflite',
+    'gguf', 'npy', 'npz', 'pkl', 'pickle', 'joblib', 'parquet', 'arrow', 'feather',
+    'mp3', 'mp4', 'wav', 'ogg', 'flac', 'avi', 'mov', 'mkv', 'webm',
+    'woff', 'woff2', 'ttf', 'otf', 'eot', 'pyc', 'class', 'db', 'sqlite', 'sqlite3'
+}
+
 TEXT_FILENAMES = {
     'dockerfile', 'license', 'readme', 'requirements.txt',
     'setup.py', 'gemfile', 'procfile', 'makefile'
@@ -27,95 +64,297 @@ EXCLUDE_EXTENSIONS = {'.lock', '.log', '.env', '.so', '.o', '.a', '.dll', '.exe'
 EXCLUDE_FILENAMES = {'.gitignore', '.DS_Store', '.gitattributes'}
 EXCLUDE_PATTERNS = {'__pycache__/', '.git/', 'node_modules/', 'dist/', 'build/'}
 
+def exclusion_file_patterns() -> List[str]:
+    """The built-in filename and extension exclusions as gitignore patterns; extensions match case-insensitively as before."""
+    patterns = sorted(EXCLUDE_FILENAMES)
+    for extension in sorted(EXCLUDE_EXTENSIONS):
+        letters = ''.join(f"[{char.lower()}{char.upper()}]" if char.isalpha() else char for char in extension[1:])
+        # "?*" keeps dotfiles such as ".env" themselves, which have no suffix
+        patterns.append(f"?*.{letters}")
+    return patterns
+
 HEADERS = {"Accept": "application/json"}
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 if GITHUB_TOKEN:
     HEADERS['Authorization'] = f'token {GITHUB_TOKEN}'
 
-def is_excluded(filepath: str) -> bool:
-    path = Path(filepath)
-    if path.name in EXCLUDE_FILENAMES or path.suffix.lower() in EXCLUDE_EXTENSIONS:
-        return True
-    normalized_path = path.as_posix()
-    if any(pattern in normalized_path for pattern in EXCLUDE_PATTERNS):
-        return True
-    return False
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+def get_session(pool_size: int = DEFAULT_MAX_WORKERS) -> "requests.Session":
+    """Return the shared keep-alive session, growing its connection pools to `pool_size` if needed."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        if pool_size > _session_pool_size:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session_pool_size = pool_size
+        return _session
+
+_scheduler = None
+
+def get_scheduler(max_concurrency: int = DEFAULT_MAX_WORKERS) -> "RequestScheduler":
+    """Return the shared request scheduler every fetch goes through, raising its per-host concurrency to `max_concurrency` if needed."""
+    global _scheduler
+    session = get_session(max_concurrency)
+    with _session_lock:
+        if _scheduler is None:
+            from .scheduler import RequestScheduler
+            _scheduler = RequestScheduler(session, max_concurrency=max_concurrency)
+        _scheduler.max_concurrency = max(_scheduler.max_concurrency, max_concurrency)
+        return _scheduler
+
+def imap_ordered(func, items: List, max_workers: int = DEFAULT_MAX_WORKERS) -> Iterator:
+    """Lazily apply `func` to `items` on a bounded thread pool, yielding results in input order.
+
+    At most ``2 * max_workers`` results are in flight or waiting to be consumed at any time.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= max_workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+def batch_local_jobs(jobs: List[Tuple], max_files: int = LOCAL_BATCH_FILES, max_bytes: int = LOCAL_BATCH_BYTES) -> List[List[Tuple]]:
+    """Group consecutive (path, size, ...) jobs into batches of at most `max_files` files or about `max_bytes` bytes."""
+    batches, batch, batch_bytes = [], [], 0
+    for job in jobs:
+        if batch and (len(batch) >= max_files or batch_bytes + job[1] > max_bytes):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(job)
+        batch_bytes += job[1]
+    if batch:
+        batches.append(batch)
+    return batches
+
+def build_exclusion_matcher(exclude: Optional[Iterable[str]] = None) -> PathMatcher:
+    """Compile the built-in exclusions plus any user-supplied gitignore-style `exclude` patterns.
+
+    Both are final, so .gitignore rules added later cannot re-include what they exclude. As
+    before, filename and extension exclusions only look at a file's own name, never a directory's.
+    """
+    matcher = PathMatcher()
+    matcher.add_patterns(exclusion_file_patterns(), final=True, files_only=True)
+    matcher.add_patterns(sorted(EXCLUDE_PATTERNS), final=True)
+    if exclude:
+        matcher.add_patterns(exclude, final=True)
+    return matcher
+
+_default_matcher = None
+
+def is_excluded(filepath: str, matcher: Optional[PathMatcher] = None) -> bool:
+    global _default_matcher
+    if matcher is None:
+        if _default_matcher is None:
+            _default_matcher = build_exclusion_matcher()
+        matcher = _default_matcher
+    return matcher.is_excluded(Path(filepath).as_posix())
 
-def is_binary_content(filename: str, content: bytes) -> bool:
+def is_gitignore(filepath: str) -> bool:
+    return filepath.rpartition('/')[2] == '.gitignore'
+
+def is_known_binary(filename: str, size: Optional[int]) -> bool:
+    return bool(size) and file_extension(filename) in BINARY_EXTENSIONS
+
+class ByteBudget:
+    """Per-file and whole-document byte limits, charged file by file in document order."""
+
+    def __init__(self, max_file_bytes: Optional[int] = None, max_total_bytes: Optional[int] = None):
+        self.max_file_bytes = max_file_bytes
+        self.remaining = max_total_bytes
+
+    def claim(self, filename: str, size: Optional[int]) -> Optional[int]:
+        """Reserve bytes for the next file and return how many to read: None for all of it, 0 for none."""
+        if is_known_binary(filename, size):
+            return None
+        limit = self.max_file_bytes
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                return 0
+            limit = self.remaining if limit is None else min(limit, self.remaining)
+            self.remaining -= limit if size is None else min(size, limit)
+        return limit
+
+# Printable ASCII plus common control characters; everything else counts towards the binary ratio
+TEXT_CHARS = bytes(range(32, 127)) + b'\n\r\t\f\b'
+TEXT_BOMS = (b'\xef\xbb\xbf', b'\xfe\xff', b'\xff\xfe')
+BINARY_SAMPLE_BYTES = 1024
+UTF8_CHECK_BYTES = 64 * 1024
+
+@functools.lru_cache(maxsize=1024)
+def has_text_mimetype(suffixes: str) -> bool:
+    # guess_type only looks at the dotted suffixes, so results are cached per suffix chain
+    mime_type, _ = mimetypes.guess_type(f"file{suffixes}")
+    return bool(mime_type and mime_type.startswith('text/'))
+
+def file_extension(filename: str) -> str:
+    """Lowercased suffix without the dot, by the same rules as ``Path(filename).suffix`` but without building a Path."""
+    name = filename.rpartition('/')[2]
+    dot = name.rfind('.')
+    return name[dot + 1:].lower() if 0 < dot < len(name) - 1 else ''
+
+def is_binary_content(filename: str, content: bytes, truncated: bool = False) -> bool:
+    """Whether a file is binary; `truncated` marks `content` as cut from a larger file, perhaps mid-character."""
     if not content:
         return False
 
-    file_path = Path(filename)
-    extension = file_path.suffix[1:].lower()
+    name = filename.rpartition('/')[2]
+    extension = file_extension(name)
 
-    if extension in TEXT_EXTENSIONS or file_path.name.lower() in TEXT_FILENAMES:
+    if extension in TEXT_EXTENSIONS or name.lower() in TEXT_FILENAMES:
         return False
 
-    mime_type, _ = mimetypes.guess_type(filename)
-    if mime_type and mime_type.startswith('text/'):
+    # Like splitext, guess_type ignores leading dots when looking for suffixes
+    stem_start = len(name) - len(name.lstrip('.'))
+    first_dot = name.find('.', stem_start)
+    if first_dot > 0 and has_text_mimetype(name[first_dot:]):
         return False
 
-    if content.startswith((b'\xef\xbb\xbf', b'\xfe\xff', b'\xff\xfe')):
+    if content.startswith(TEXT_BOMS):
         return False
 
-    sample = content[:1024]
+    sample = content[:BINARY_SAMPLE_BYTES]
     if b'\0' in sample:
         return True
 
-    text_chars = set(bytes(range(32, 127)) + b'\n\r\t\f\b')
-    if len(sample) > 0:
-        non_text_ratio = sum(1 for byte in sample if byte not in text_chars) / len(sample)
-        if non_text_ratio > 0.30:
-            return True
+    # translate() drops the text bytes in C, leaving only the non-text ones to count
+    if len(sample.translate(None, TEXT_CHARS)) / len(sample) > 0.30:
+        return True
 
+    # Validate a bounded prefix; final=False tolerates a character split at the cut
     try:
-        content.decode('utf-8')
+        codecs.utf_8_decode(content[:UTF8_CHECK_BYTES], 'strict', not truncated and len(content) <= UTF8_CHECK_BYTES)
         return False
     except UnicodeDecodeError:
         return True
 
-def generate_file_tree(paths: List[str]) -> str:
-    tree = ["📁 Root"]
-    structure = {}
-    for path in sorted(paths):
+def classify_binary(items: Iterable[Tuple[str, bytes]]) -> List[bool]:
+    """Classify many (filename, content) pairs; the same as calling is_binary_content on each.
+
+    This is a convenience, not a faster path: the per-file work is already done in C, and
+    marking the joined samples of a batch with one translate() measured slower than one per file.
+    """
+    return [is_binary_content(filename, content) for filename, content in items]
+
+def iter_file_tree(paths: Iterable[str], max_depth: Optional[int] = None, max_entries: Optional[int] = None) -> Iterator[str]:
+    """Yield the lines of the file tree below "📁 Root" from a single pass over the sorted paths.
+
+    Entries nested deeper than `max_depth` levels, or past the first `max_entries` of a directory,
+    are collapsed into one "… N more files" line per directory.
+    """
+    # With "/" mapped below every other character, plain string order is per-component order,
+    # so each directory's contents directly follow it and siblings come out sorted
+    ordered = sorted(set(paths), key=lambda path: path.replace('/', '\0'))
+    limited = max_depth is not None or max_entries is not None
+    names = []
+    # One frame per open directory, root first: [entries shown, files hidden, visible]
+    frames = [[0, 0, True]]
+
+    def summary(frame: list, depth: int) -> Optional[str]:
+        if frame[1] and frame[2]:
+            return f"{'  ' * depth}… {frame[1]} more file{'s' if frame[1] != 1 else ''}"
+        return None
+
+    for index, path in enumerate(ordered):
         parts = path.split('/')
-        current_level = structure
-        for part in parts:
-            current_level = current_level.setdefault(part, {})
+        next_path = ordered[index + 1] if index + 1 < len(ordered) else ''
+        # A path is a directory if its contents follow it, as when both "a" and "a/b" are listed
+        leaf = None if next_path.startswith(path + '/') else parts.pop()
+
+        if parts != names:
+            common = 0
+            while common < len(names) and common < len(parts) and names[common] == parts[common]:
+                common += 1
+            while len(names) > common:
+                names.pop()
+                line = summary(frames.pop(), len(names) + 1)
+                if line:
+                    yield line
+            for name in parts[common:]:
+                depth, parent = len(names), frames[-1]
+                visible = parent[2] and (max_depth is None or depth < max_depth) and (max_entries is None or parent[0] < max_entries)
+                if visible:
+                    parent[0] += 1
+                    yield f"{'  ' * depth}📁 {name}"
+                names.append(name)
+                frames.append([0, 0, visible])
+
+        if leaf is not None:
+            depth, parent = len(names), frames[-1]
+            if not limited:
+                yield f"{'  ' * depth}📄 {leaf}"
+            elif parent[2] and (max_depth is None or depth < max_depth) and (max_entries is None or parent[0] < max_entries):
+                parent[0] += 1
+                yield f"{'  ' * depth}📄 {leaf}"
+            else:
+                # Charge the hidden file to the deepest directory still on display
+                next(frame for frame in reversed(frames) if frame[2])[1] += 1
+
+    while frames:
+        line = summary(frames.pop(), len(frames))
+        if line:
+            yield line
 
-    def build_tree(level_structure, indent=""):
-        for name in sorted(level_structure.keys()):
-            is_dir = bool(level_structure[name])
-            icon = "📁" if is_dir else "📄"
-            tree.append(f"{indent}{icon} {name}")
-            if is_dir:
-                build_tree(level_structure[name], indent + "  ")
+def generate_file_tree(paths: List[str], max_depth: Optional[int] = None, max_entries: Optional[int] = None) -> str:
+    with metrics.span("tree", entries=len(paths)):
+        return "\n".join(["📁 Root", *iter_file_tree(paths, max_depth, max_entries)]) + "\n\n"
 
-    build_tree(structure)
-    return "\n".join(tree) + "\n\n"
+def get_github_default_branch(owner: str, repo: str) -> str:
+    repo_info_url = f"{GITHUB_API}{owner}/{repo}"
+    repo_response = get_scheduler().get(repo_info_url, headers=HEADERS, conditional=True, timeout=10)
+    repo_response.raise_for_status()
+    return repo_response.json()['default_branch']
+
+def get_github_branch_head(owner: str, repo: str, branch: str) -> Tuple[str, str]:
+    """Return the commit SHA and tree SHA at the tip of `branch`."""
+    branch_info_url = f"{GITHUB_API}{owner}/{repo}/branches/{branch}"
+    branch_response = get_scheduler().get(branch_info_url, headers=HEADERS, conditional=True, timeout=10)
+    branch_response.raise_for_status()
+    commit = branch_response.json()['commit']
+    return commit['sha'], commit['commit']['tree']['sha']
+
+def get_github_head_commit(owner: str, repo: str, retry: bool = True, timeout: float = 10) -> str:
+    """Return the SHA of the commit at the tip of the default branch, in a single request."""
+    head_url = f"{GITHUB_API}{owner}/{repo}/commits/HEAD"
+    head_response = get_scheduler().get(head_url, headers={**HEADERS, "Accept": "application/vnd.github.sha"},
+                                        conditional=True, retry=retry, timeout=timeout)
+    head_response.raise_for_status()
+    return head_response.text.strip()
+
+def get_github_tree(owner: str, repo: str, tree_sha: str) -> List[Dict]:
+    tree_url = f"{GITHUB_API}{owner}/{repo}/git/trees/{tree_sha}?recursive=1"
+    tree_response = get_scheduler().get(tree_url, headers=HEADERS, conditional=True, timeout=30)
+    tree_response.raise_for_status()
+    return [
+        {"path": item['path'], "sha": item['sha'], "size": item.get('size')}
+        for item in tree_response.json()['tree']
+        if item['type'] == 'blob'
+    ]
 
 def get_github_files_recursive(owner: str, repo: str) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    import requests
     try:
-        repo_info_url = f"{GITHUB_API}{owner}/{repo}"
-        repo_response = requests.get(repo_info_url, headers=HEADERS, timeout=10)
-        repo_response.raise_for_status()
-        default_branch = repo_response.json()['default_branch']
-
-        branch_info_url = f"{GITHUB_API}{owner}/{repo}/branches/{default_branch}"
-        branch_response = requests.get(branch_info_url, headers=HEADERS, timeout=10)
-        branch_response.raise_for_status()
-        tree_sha = branch_response.json()['commit']['commit']['tree']['sha']
-
-        tree_url = f"{GITHUB_API}{owner}/{repo}/git/trees/{tree_sha}?recursive=1"
-        tree_response = requests.get(tree_url, headers=HEADERS, timeout=30)
-        tree_response.raise_for_status()
-
-        files = [
-            {"path": item['path']}
-            for item in tree_response.json()['tree']
-            if item['type'] == 'blob'
-        ]
-        return files, default_branch
+        default_branch = get_github_default_branch(owner, repo)
+        _, tree_sha = get_github_branch_head(owner, repo, default_branch)
+        return get_github_tree(owner, repo, tree_sha), default_branch
 
     except requests.RequestException as e:
         error_message = f"Error fetching from GitHub API: {e}. "
@@ -123,11 +362,98 @@ def get_github_files_recursive(owner: str, repo: str) -> Tuple[Optional[List[Dic
             error_message += "You may have hit the rate limit. Please set a GITHUB_TOKEN environment variable."
         raise ConnectionError(error_message) from e
 
+def get_github_changed_paths(owner: str, repo: str, base: str, head: str) -> Optional[set]:
+    """Return the paths added, modified, removed or renamed from `base` to `head`.
+
+    Returns None when the comparison cannot stand in for a full listing: `base` is gone or not an
+    ancestor of `head` (e.g. after a force push), or GitHub truncated the file list.
+    """
+    compare_url = f"{GITHUB_API}{owner}/{repo}/compare/{base}...{head}"
+    compare_response = get_scheduler().get(compare_url, headers=HEADERS, conditional=True, timeout=30)
+    if compare_response.status_code == 404:
+        return None
+    compare_response.raise_for_status()
+    comparison = compare_response.json()
+    files = comparison.get('files', [])
+    if comparison.get('status') not in ('ahead', 'identical') or len(files) >= COMPARE_FILE_LIMIT:
+        return None
+    changed = set()
+    for item in files:
+        if item.get('status') != 'unchanged':
+            changed.add(item['filename'])
+            if item.get('previous_filename'):
+                changed.add(item['previous_filename'])
+    return changed
+
+def iter_github_archive(owner: str, repo: str, ref: str, matcher: Optional[PathMatcher] = None) -> Iterator[Tuple[str, int, Callable[[Optional[int]], bytes]]]:
+    """Stream the repository tarball at `ref`, yielding (path, size, read) for each non-excluded file.
+
+    Members are read straight from the HTTP response; nothing is extracted to disk. ``read(limit)``
+    returns up to `limit` bytes of the member (all of it for None) and must be called before the
+    generator is advanced, since the stream cannot go back.
+    """
+    matcher = matcher or build_exclusion_matcher()
+    archive_url = f"{GITHUB_API}{owner}/{repo}/tarball/{ref}"
+    with get_scheduler().get(archive_url, headers=HEADERS, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        try:
+            with tarfile.open(fileobj=response.raw, mode='r|*') as archive:
+                for member in archive:
+                    # Members are prefixed with a single "{owner}-{repo}-{sha}/" directory
+                    path = member.name.partition('/')[2]
+                    if not path or not (member.isfile() or member.issym()):
+                        continue
+                    if matcher.is_excluded(path):
+                        continue
+                    if member.issym():
+                        target = member.linkname.encode('utf-8')
+                        yield path, len(target), lambda limit, target=target: target[:limit]
+                    else:
+                        reader = archive.extractfile(member)
+                        yield path, member.size, lambda limit, reader=reader: reader.read(-1 if limit is None else limit)
+        finally:
+            get_scheduler().count_bytes(response.raw.tell())
+
+def iter_archive_sections(owner: str, repo: str, default_branch: str, ref: str, jobs: List[Tuple[Dict, Optional[int]]],
+                          matcher: PathMatcher, cache: Optional[BlobCache] = None) -> Iterator[str]:
+    """Format each (item, max_bytes) job in order as its member streams past in the tarball at `ref`.
+
+    The tarball holds files in the same Git tree order as the listing, so sections are produced
+    as the download proceeds. Listed files the tarball lacks (e.g. marked export-ignore), and
+    every file left when the stream fails, are fetched one at a time in their place instead.
+    """
+    import requests
+    positions = {item['path']: index for index, (item, _) in enumerate(jobs)}
+    done = 0
+
+    def fetch(job: Tuple[Dict, Optional[int]]) -> str:
+        return process_file_content(job[0], owner, repo, default_branch, False, cache, job[1])
+
+    try:
+        for path, size, read in iter_github_archive(owner, repo, ref, matcher):
+            position = positions.get(path)
+            if position is None or position < done:
+                continue
+            while done < position:
+                yield fetch(jobs[done])
+                done += 1
+            section = format_file_entry(path, size, jobs[position][1], read)
+            done += 1
+            yield section
+    except (requests.RequestException, tarfile.TarError):
+        pass
+    for job in jobs[done:]:
+        yield fetch(job)
+
 def get_hf_files(owner: str, repo: str) -> List[Dict]:
+    # Imported here because the Hub client takes longer to import than the rest of the package
+    from huggingface_hub import HfApi
+    from huggingface_hub.hf_api import RepoFile
     try:
         api = HfApi(token=os.getenv('HF_TOKEN'))
-        file_paths = api.list_repo_files(repo_id=f'{owner}/{repo}', repo_type="space")
-        return [{"path": path} for path in file_paths]
+        entries = api.list_repo_tree(repo_id=f'{owner}/{repo}', repo_type="space", recursive=True)
+        return [{"path": entry.path, "sha": entry.blob_id, "size": entry.size} for entry in entries if isinstance(entry, RepoFile)]
     except Exception as e:
         raise ConnectionError(f"Error fetching from Hugging Face Hub: {e}") from e
 
@@ -153,34 +479,118 @@ def get_repo_contents(url: str) -> Tuple[Optional[str], Optional[str], Optional[
     except Exception as e:
         return None, None, None, f"Error fetching repo contents: {str(e)}", False
 
-def process_file_content(file_info: Dict, owner: str, repo: str, default_branch: Optional[str] = None, is_hf: bool = False) -> str:
+def load_repo_gitignores(contents: List[Dict], matcher: PathMatcher, owner: str, repo: str, default_branch: Optional[str] = None, is_hf: bool = False,
+                         cache: Optional[BlobCache] = None, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+    """Fetch the listing's .gitignore files, outermost first, and add their rules to `matcher`."""
+    import requests
+    gitignores = sorted(
+        (item for item in contents if is_gitignore(item['path']) and matcher.excluded_ancestor(item['path']) is None),
+        key=lambda item: item['path'].count('/')
+    )
+
+    def fetch(item: Dict) -> Optional[bytes]:
+        try:
+            return fetch_file_bytes(item, owner, repo, default_branch, is_hf, cache)
+        except requests.RequestException:
+            return None
+
+    for item, content_raw in zip(gitignores, imap_ordered(fetch, gitignores, max_workers)):
+        if content_raw is not None:
+            matcher.add_gitignore(content_raw.decode('utf-8', errors='replace'), base=item['path'].rpartition('/')[0])
+
+def format_file_content(file_path: str, content_raw: bytes, original_size: Optional[int] = None) -> str:
+    """Format one file section; `original_size` marks `content_raw` as the first bytes of a larger file."""
+    truncated = original_size is not None
+    # Per-file spans are skipped outright when nothing listens, as this runs for every file
+    if not metrics.enabled():
+        return render_file_content(file_path, content_raw, original_size, is_binary_content(file_path, content_raw, truncated))
+    with metrics.span("classify", path=file_path, bytes_in=len(content_raw)):
+        is_binary = is_binary_content(file_path, content_raw, truncated)
+    with metrics.span("format", path=file_path) as span:
+        section = render_file_content(file_path, content_raw, original_size, is_binary)
+        span.set(bytes_out=len(section.encode('utf-8')))
+    return section
+
+def render_file_content(file_path: str, content_raw: bytes, original_size: Optional[int], is_binary: bool) -> str:
+    if is_binary:
+        return f"### File: {file_path}\n[Binary file - {original_size or len(content_raw)} bytes]\n\n"
+
+    text_content = content_raw.decode('utf-8', errors='replace')
+    language = file_extension(file_path) or 'text'
+
+    if original_size is not None:
+        return f"### File: {file_path}\n```{language}\n{text_content}\n```\n[Note: File truncated to {len(content_raw)} of {original_size} bytes]\n\n"
+
+    if language == 'json':
+        try:
+            formatted_json = json.dumps(json.loads(text_content), indent=2)
+            return f"### File: {file_path}\n```json\n{formatted_json}\n```\n\n"
+        except json.JSONDecodeError:
+            return f"### File: {file_path}\n```json\n{text_content}\n```\n[Note: Invalid JSON format]\n\n"
+
+    return f"### File: {file_path}\n```{language}\n{text_content}\n```\n\n"
+
+def format_file_entry(file_path: str, size: Optional[int], max_bytes: Optional[int], read: Callable[[Optional[int]], bytes]) -> str:
+    """Format one file from its listed size, calling ``read(limit)`` only if its content is needed.
+
+    Known binaries are described from `size` alone, files over `max_bytes` are read only up to the
+    limit, and a `max_bytes` of 0 means the document budget is spent and the file is skipped.
+    """
+    if is_known_binary(file_path, size):
+        return f"### File: {file_path}\n[Binary file - {size} bytes]\n\n"
+    if max_bytes == 0:
+        return f"### File: {file_path}\n[Skipped - document size budget reached ({size if size is not None else 'unknown'} bytes)]\n\n"
+    limit = max_bytes if max_bytes is not None and size is not None and size > max_bytes else None
+    if metrics.enabled():
+        with metrics.span("fetch", path=file_path) as span:
+            content_raw = read(limit)
+            span.set(bytes_in=len(content_raw))
+    else:
+        content_raw = read(limit)
+    if max_bytes is not None and size is not None and size > max_bytes:
+        return format_file_content(file_path, content_raw, original_size=size)
+    if max_bytes is not None and len(content_raw) > max_bytes:
+        return format_file_content(file_path, content_raw[:max_bytes], original_size=len(content_raw))
+    return format_file_content(file_path, content_raw)
+
+def fetch_file_bytes(file_info: Dict, owner: str, repo: str, default_branch: Optional[str] = None, is_hf: bool = False, cache: Optional[BlobCache] = None, limit: Optional[int] = None) -> bytes:
+    """Download a listed file, or its first `limit` bytes, going through `cache` when one is given."""
     file_path = file_info['path']
-    try:
-        if is_hf:
-            url = f"https://huggingface.co/spaces/{owner}/{repo}/raw/main/{file_path}"
-            response = requests.get(url, timeout=10)
-        else:
-            url = f"https://raw.githubusercontent.com/{owner}/{repo}/{default_branch}/{file_path}"
-            response = requests.get(url, timeout=10)
+    sha = file_info.get('sha') if cache is not None else None
+    if sha:
+        with metrics.span("cache", path=file_path) as span:
+            content_raw = cache.get(sha)
+            span.set(hit=content_raw is not None)
+        if content_raw is not None:
+            return content_raw[:limit]
+
+    if is_hf:
+        url = f"{HF_SPACES_URL}{owner}/{repo}/raw/main/{file_path}"
+    else:
+        url = f"{GITHUB_RAW_URL}{owner}/{repo}/{default_branch}/{file_path}"
 
+    if limit is None:
+        response = get_scheduler().get(url, timeout=10)
         response.raise_for_status()
-        content_raw = response.content
-        
-        if is_binary_content(file_path, content_raw):
-            return f"### File: {file_path}\n[Binary file - {len(content_raw)} bytes]\n\n"
-        
-        text_content = content_raw.decode('utf-8', errors='replace')
-        file_extension = Path(file_path).suffix[1:].lower() or 'text'
-        
-        if file_extension == 'json':
-            try:
-                formatted_json = json.dumps(json.loads(text_content), indent=2)
-                return f"### File: {file_path}\n```json\n{formatted_json}\n```\n\n"
-            except json.JSONDecodeError:
-                return f"### File: {file_path}\n```json\n{text_content}\n```\n[Note: Invalid JSON format]\n\n"
-        
-        return f"### File: {file_path}\n```{file_extension}\n{text_content}\n```\n\n"
+        if sha:
+            cache.put(sha, response.content)
+        return response.content
+    # Ask for the first `limit` bytes only; servers that ignore Range are cut off after them
+    with get_scheduler().get(url, headers={'Range': f'bytes=0-{limit - 1}'}, stream=True, timeout=10) as response:
+        response.raise_for_status()
+        content = response.raw.read(limit, decode_content=True)
+        get_scheduler().count_bytes(response.raw.tell())
+        return content
+
+def process_file_content(file_info: Dict, owner: str, repo: str, default_branch: Optional[str] = None, is_hf: bool = False, cache: Optional[BlobCache] = None, max_bytes: Optional[int] = None) -> str:
+    import requests
+    file_path = file_info['path']
+
+    def read(limit: Optional[int]) -> bytes:
+        return fetch_file_bytes(file_info, owner, repo, default_branch, is_hf, cache, limit)
 
+    try:
+        return format_file_entry(file_path, file_info.get('size'), max_bytes, read)
     except requests.RequestException as e:
         error_message = f"Error fetching file content: {e}"
         if '404' in str(e):
@@ -189,84 +599,519 @@ def process_file_content(file_info: Dict, owner: str, repo: str, default_branch:
     except Exception as e:
         return f"### File: {file_path}\n[Error processing file: {str(e)}]\n\n"
 
-def process_uploaded_file(file: object) -> str:
+def get_upload_size(file: object) -> Optional[int]:
+    try:
+        position = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        file.seek(position)
+        return size - position
+    except (AttributeError, OSError, TypeError, ValueError):
+        return None
+
+def process_uploaded_file(file: object, max_bytes: Optional[int] = None, size: Optional[int] = None) -> str:
     filename = getattr(file, 'filename', 'unknown')
     try:
-        content_raw = file.read()
-        
-        if is_binary_content(filename, content_raw):
-            return f"### File: {filename}\n[Binary file - {len(content_raw)} bytes]\n\n"
-        
-        text_content = content_raw.decode('utf-8', errors='replace')
-        file_extension = Path(filename).suffix[1:].lower() or 'text'
-        
-        if file_extension == 'json':
-            try:
-                formatted_json = json.dumps(json.loads(text_content), indent=2)
-                return f"### File: {filename}\n```json\n{formatted_json}\n```\n\n"
-            except json.JSONDecodeError:
-                return f"### File: {filename}\n```json\n{text_content}\n```\n[Note: Invalid JSON format]\n\n"
-        return f"### File: {filename}\n```{file_extension}\n{text_content}\n```\n\n"
+        return format_file_entry(filename, size, max_bytes, lambda limit: file.read(-1 if limit is None else limit))
     except Exception as e:
         return f"### File: {filename}\n[Error processing file: {str(e)}]\n\n"
 
-def create_markdown_document(url: Optional[str] = None, files: Optional[List[object]] = None) -> str:
-    if url:
-        owner, repo, default_branch, contents, is_hf = get_repo_contents(url)
+def process_local_file(file_path: str, size: Optional[int], read: Callable[[Optional[int]], bytes], max_bytes: Optional[int] = None) -> str:
+    try:
+        return format_file_entry(file_path, size, max_bytes, read)
+    except Exception as e:
+        return f"### File: {file_path}\n[Error processing file: {str(e)}]\n\n"
+
+def report_progress(items: Iterable, total: Optional[int], progress: Optional[Callable[[int, Optional[int]], None]]) -> Iterator:
+    """Pass `items` through, calling ``progress(done, total)`` as each one is produced."""
+    if progress is None:
+        yield from items
+        return
+    for done, item in enumerate(items, 1):
+        progress(done, total)
+        yield item
+
+def iter_markdown_document(url: Optional[str] = None, files: Optional[List[object]] = None, max_workers: Optional[int] = None, archive: bool = False, cache: Optional[BlobCache] = None,
+                           max_file_bytes: Optional[int] = None, max_total_bytes: Optional[int] = None, exclude: Optional[List[str]] = None, use_gitignore: bool = True,
+                           tree_max_depth: Optional[int] = None, tree_max_entries: Optional[int] = None,
+                           progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                           path: Optional[Union[str, Path]] = None, revision: Optional[str] = None) -> Iterator[str]:
+    """Yield the Markdown document piece by piece: header, file tree, then one chunk per file.
+
+    With ``archive=True`` a GitHub repository's files are read from a single tarball download of
+    its default branch instead of one raw request per file. The tree is listed (and its .gitignore
+    files fetched) first, and each file is formatted as it streams past. A local `path` is read from disk, or
+    from its Git object database at `revision` when one is given. `max_workers` bounds concurrent
+    reads: DEFAULT_MAX_WORKERS for URLs and LOCAL_MAX_WORKERS for local paths unless given. A `cache` serves unchanged files by
+    blob SHA without downloading them again. Files larger than `max_file_bytes` are cut off,
+    and once `max_total_bytes` of content has been included the remaining files are listed
+    but skipped. `exclude` adds gitignore-style patterns to the built-in exclusions, and the
+    source's own .gitignore files are honoured unless `use_gitignore` is False. `tree_max_depth`
+    and `tree_max_entries` collapse the file tree as in `iter_file_tree`. `progress` is called
+    as ``progress(files_done, files_total)`` after each file. On failure a single ``"Error: ..."`` chunk is yielded instead.
+    """
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS if url else LOCAL_MAX_WORKERS
+    budget = ByteBudget(max_file_bytes, max_total_bytes)
+    matcher = build_exclusion_matcher(exclude)
+    if url and archive and "huggingface.co" not in url.lower():
+        parts = url.rstrip('/').split('/')
+        owner, repo = parts[-2], parts[-1]
+        import requests
+        get_scheduler(max_workers)
+        try:
+            with metrics.span("listing", source=url):
+                default_branch = get_github_default_branch(owner, repo)
+                head_sha, tree_sha = get_github_branch_head(owner, repo, default_branch)
+                contents = get_github_tree(owner, repo, tree_sha)
+        except requests.RequestException as e:
+            yield f"Error: Error fetching from GitHub API: {e}"
+            return
+
+        with metrics.span("filtering", source=url):
+            if use_gitignore:
+                load_repo_gitignores(contents, matcher, owner, repo, default_branch, False, cache, max_workers)
+            filtered_contents = list(matcher.filter(contents, key=lambda item: item['path']))
+        if not filtered_contents:
+            yield "Error: No non-excluded files found in the repository."
+            return
+
+        yield f"# Repository: {owner}/{repo}\n"
+        yield "## File Structure\n"
+        yield generate_file_tree([item['path'] for item in filtered_contents], tree_max_depth, tree_max_entries)
+        yield "Below are the contents of all files in the repository:\n\n"
+        jobs = [(item, budget.claim(item['path'], item.get('size'))) for item in filtered_contents]
+        with metrics.span("archive", source=url):
+            # The tarball is taken at the listed commit so both hold the same files
+            yield from report_progress(iter_archive_sections(owner, repo, default_branch, head_sha, jobs, matcher, cache),
+                                       len(jobs), progress)
+    elif url:
+        with metrics.span("listing", source=url):
+            owner, repo, default_branch, contents, is_hf = get_repo_contents(url)
         if isinstance(contents, str):
-            return f"Error: {contents}"
-        
-        filtered_contents = [item for item in contents if not is_excluded(item['path'])]
+            yield f"Error: {contents}"
+            return
+
+        get_scheduler(max_workers)
+        with metrics.span("filtering", source=url):
+            if use_gitignore:
+                load_repo_gitignores(contents, matcher, owner, repo, default_branch, is_hf, cache, max_workers)
+            filtered_contents = list(matcher.filter(contents, key=lambda item: item['path']))
         if not filtered_contents:
-            return "Error: No non-excluded files found in the repository."
-
-        markdown_content = [
-            f"# {'Space' if is_hf else 'Repository'}: {owner}/{repo}\n",
-            "## File Structure\n",
-            generate_file_tree([item['path'] for item in filtered_contents]),
-            f"Below are the contents of all files in the {'space' if is_hf else 'repository'}:\n\n"
-        ]
-        markdown_content.extend(process_file_content(item, owner, repo, default_branch, is_hf) for item in filtered_contents)
+            yield "Error: No non-excluded files found in the repository."
+            return
+
+        yield f"# {'Space' if is_hf else 'Repository'}: {owner}/{repo}\n"
+        yield "## File Structure\n"
+        yield generate_file_tree([item['path'] for item in filtered_contents], tree_max_depth, tree_max_entries)
+        yield f"Below are the contents of all files in the {'space' if is_hf else 'repository'}:\n\n"
+        # Budgets are claimed up front in document order so concurrent fetches stay deterministic
+        jobs = [(item, budget.claim(item['path'], item.get('size'))) for item in filtered_contents]
+        yield from report_progress(imap_ordered(
+            lambda job: process_file_content(job[0], owner, repo, default_branch, is_hf, cache, job[1]),
+            jobs,
+            max_workers
+        ), len(jobs), progress)
+    elif path is not None and revision is None:
+        root = Path(path)
+        if not root.is_dir():
+            yield f"Error: {path} is not a directory."
+            return
+        try:
+            # Exclusions are applied during the walk, so this covers filtering as well
+            with metrics.span("listing", source=os.fspath(path)):
+                entries = list(iter_local_files(root, matcher, use_gitignore))
+        except OSError as e:
+            yield f"Error: Error reading directory: {e}"
+            return
+        if not entries:
+            yield "Error: No non-excluded files found in the directory."
+            return
+
+        yield f"# Directory: {root.resolve().name}\n"
+        yield "## File Structure\n"
+        yield generate_file_tree([file_path for file_path, _, _ in entries], tree_max_depth, tree_max_entries)
+        yield "Below are the contents of all files in the directory:\n\n"
+        jobs = [(file_path, size, read, budget.claim(file_path, size)) for file_path, size, read in entries]
+        # Local reads are cheap enough that one task per file costs more in thread handoffs than it saves
+        sections = (
+            section
+            for batch in imap_ordered(lambda batch: [process_local_file(*job) for job in batch], batch_local_jobs(jobs), max_workers)
+            for section in batch
+        )
+        yield from report_progress(sections, len(jobs), progress)
+    elif path is not None:
+        try:
+            with metrics.span("listing", source=os.fspath(path), revision=revision):
+                contents = list_git_tree(path, revision)
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, 'stderr', None)
+            yield f"Error: Error listing {revision} in {path}: {stderr.decode(errors='replace').strip() if stderr else e}"
+            return
+
+        with GitObjectReader(path) as objects:
+            with metrics.span("filtering", source=os.fspath(path), revision=revision):
+                if use_gitignore:
+                    for item in sorted((item for item in contents if is_gitignore(item['path'])), key=lambda item: item['path'].count('/')):
+                        if matcher.excluded_ancestor(item['path']) is None:
+                            matcher.add_gitignore(objects.read(item['sha']).decode('utf-8', errors='replace'), base=item['path'].rpartition('/')[0])
+                filtered_contents = list(matcher.filter(contents, key=lambda item: item['path']))
+            if not filtered_contents:
+                yield "Error: No non-excluded files found in the repository."
+                return
+
+            yield f"# Repository: {Path(path).resolve().name} ({revision})\n"
+            yield "## File Structure\n"
+            yield generate_file_tree([item['path'] for item in filtered_contents], tree_max_depth, tree_max_entries)
+            yield "Below are the contents of all files in the repository:\n\n"
+            # One cat-file process serves objects in order, so sections are produced sequentially
+            sections = (
+                process_local_file(item['path'], item['size'], lambda limit, sha=item['sha']: objects.read(sha)[:limit],
+                                   budget.claim(item['path'], item['size']))
+                for item in filtered_contents
+            )
+            yield from report_progress(sections, len(filtered_contents), progress)
     else:
-        filtered_files = [file for file in files if hasattr(file, 'filename') and not is_excluded(file.filename)]
+        files = [file for file in files if hasattr(file, 'filename')]
+        with metrics.span("filtering", source="uploads"):
+            if use_gitignore:
+                for file in sorted((file for file in files if is_gitignore(file.filename)), key=lambda file: file.filename.count('/')):
+                    matcher.add_gitignore(file.read().decode('utf-8', errors='replace'), base=file.filename.rpartition('/')[0])
+            filtered_files = list(matcher.filter(files, key=lambda file: file.filename))
         if not filtered_files:
-            return "Error: No non-excluded files were uploaded."
-
-        markdown_content = [
-            "# Uploaded Files\n",
-            "## File Structure\n",
-            generate_file_tree([file.filename for file in filtered_files]),
-            "Below are the contents of all uploaded files:\n\n"
-        ]
-        markdown_content.extend(process_uploaded_file(file) for file in filtered_files)
-    
-    return "".join(markdown_content)
-
-def markdown_to_files(markdown_text: str) -> Tuple[Union[List[Dict], str], Dict[str, bytes]]:
-    files, buffers = [], {}
-    current_filename, current_content = None, []
-    is_binary, in_code_block = False, False
-
-    for line in markdown_text.splitlines():
-        if line.startswith("### File: "):
-            if current_filename:
-                content = "\n".join(current_content) if not is_binary else ""
-                files.append({"filename": current_filename, "content": "[Binary File]" if is_binary else content, "is_binary": is_binary, "filepath": current_filename})
-                buffers[current_filename] = b"[Binary content not stored]" if is_binary else content.encode('utf-8')
-            current_filename, current_content = line[len("### File: "):].strip(), []
-            is_binary, in_code_block = False, False
-        elif line.startswith("[Binary file - ") and current_filename:
-            is_binary = True
-        elif line.startswith("```"):
-            in_code_block = not in_code_block
-        elif in_code_block and not is_binary:
-            current_content.append(line)
-
-    if current_filename:
-        content = "\n".join(current_content) if not is_binary else ""
-        files.append({"filename": current_filename, "content": "[Binary File]" if is_binary else content, "is_binary": is_binary, "filepath": current_filename})
-        buffers[current_filename] = b"[Binary content not stored]" if is_binary else content.encode('utf-8')
+            yield "Error: No non-excluded files were uploaded."
+            return
+
+        yield "# Uploaded Files\n"
+        yield "## File Structure\n"
+        yield generate_file_tree([file.filename for file in filtered_files], tree_max_depth, tree_max_entries)
+        yield "Below are the contents of all uploaded files:\n\n"
+        for done, file in enumerate(filtered_files, 1):
+            size = get_upload_size(file)
+            section = process_uploaded_file(file, budget.claim(file.filename, size), size)
+            if progress:
+                progress(done, len(filtered_files))
+            yield section
+
+def create_markdown_document(url: Optional[str] = None, files: Optional[List[object]] = None, max_workers: Optional[int] = None, archive: bool = False, cache: Optional[BlobCache] = None,
+                             max_file_bytes: Optional[int] = None, max_total_bytes: Optional[int] = None, exclude: Optional[List[str]] = None, use_gitignore: bool = True,
+                             tree_max_depth: Optional[int] = None, tree_max_entries: Optional[int] = None,
+                             path: Optional[Union[str, Path]] = None, revision: Optional[str] = None) -> str:
+    return "".join(iter_markdown_document(url, files, max_workers=max_workers, archive=archive, cache=cache,
+                                          max_file_bytes=max_file_bytes, max_total_bytes=max_total_bytes,
+                                          exclude=exclude, use_gitignore=use_gitignore,
+                                          tree_max_depth=tree_max_depth, tree_max_entries=tree_max_entries,
+                                          path=path, revision=revision))
+
+def is_complete_section(section: Dict, text: str) -> bool:
+    """Whether a section holds its whole file, rather than a truncated, skipped or failed one."""
+    if section['is_binary']:
+        return True
+    return section['language'] is not None and not text.rstrip('\n').rpartition('\n')[2].startswith(NOTE_PREFIX + "File truncated")
+
+def refresh_markdown_document(url: str, document: Optional[str] = None, base_sha: Optional[str] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                              cache: Optional[BlobCache] = None, max_file_bytes: Optional[int] = None, max_total_bytes: Optional[int] = None,
+                              exclude: Optional[List[str]] = None, use_gitignore: bool = True,
+                              tree_max_depth: Optional[int] = None, tree_max_entries: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    """Bring `document`, generated from a GitHub repository at commit `base_sha`, up to date.
+
+    Only the files GitHub's compare API reports as added, modified, removed or renamed since
+    `base_sha` are fetched; every other section is copied from `document` and the tree is rebuilt
+    from the current listing. Without a document, or when the comparison is unusable, the whole
+    document is built as by create_markdown_document. Options should match those `document` was
+    generated with. Returns the document and the head commit SHA to pass as `base_sha` next time;
+    on failure, an ``"Error: ..."`` string and None.
+    """
+    import requests
+    if "huggingface.co" in url.lower():
+        return "Error: Incremental refresh is only supported for GitHub repositories.", None
+    parts = url.rstrip('/').split('/')
+    owner, repo = parts[-2], parts[-1]
+    get_scheduler(max_workers)
+    try:
+        default_branch = get_github_default_branch(owner, repo)
+        head_sha, tree_sha = get_github_branch_head(owner, repo, default_branch)
+        if document and base_sha == head_sha:
+            return document, head_sha
+        changed = get_github_changed_paths(owner, repo, base_sha, head_sha) if document and base_sha else None
+        contents = get_github_tree(owner, repo, tree_sha)
+    except requests.RequestException as e:
+        return f"Error: Error fetching from GitHub API: {e}", None
+
+    previous = {}
+    if changed is not None:
+        for start, end, section in iter_section_spans(document):
+            text = document[start:end]
+            if section['filename'] not in changed and is_complete_section(section, text):
+                previous[section['filename']] = text
+
+    matcher = build_exclusion_matcher(exclude)
+    if use_gitignore:
+        load_repo_gitignores(contents, matcher, owner, repo, default_branch, False, cache, max_workers)
+    filtered_contents = list(matcher.filter(contents, key=lambda item: item['path']))
+    if not filtered_contents:
+        return "Error: No non-excluded files found in the repository.", None
+
+    budget = ByteBudget(max_file_bytes, max_total_bytes)
+    jobs = [(item, budget.claim(item['path'], item.get('size'))) for item in filtered_contents]
+
+    def reusable(job: Tuple[Dict, Optional[int]]) -> bool:
+        item, max_bytes = job
+        size = item.get('size')
+        # A kept section must still be whole under this run's budget
+        return item['path'] in previous and (max_bytes is None or (max_bytes > 0 and size is not None and size <= max_bytes))
+
+    fetched = imap_ordered(
+        lambda job: process_file_content(job[0], owner, repo, default_branch, False, cache, job[1]),
+        [job for job in jobs if not reusable(job)],
+        max_workers
+    )
+    chunks = [
+        f"# Repository: {owner}/{repo}\n",
+        "## File Structure\n",
+        generate_file_tree([item['path'] for item in filtered_contents], tree_max_depth, tree_max_entries),
+        "Below are the contents of all files in the repository:\n\n",
+    ]
+    chunks.extend(previous[job[0]['path']] if reusable(job) else next(fetched) for job in jobs)
+    return "".join(chunks), head_sha
+
+FILE_HEADER = "### File: "
+FENCE = "```"
+NOTE_PREFIX = "[Note: "
+BINARY_NOTE = re.compile(r"\[Binary file - (?:.*?, )?(\d+) bytes\]")
+INDEX_SUFFIX = ".idx.json"
+
+def find_line(text: str, prefix: str, pos: int) -> int:
+    """Return the start of the first line at or after line start `pos` beginning with `prefix`, or -1."""
+    if text.startswith(prefix, pos):
+        return pos
+    found = text.find("\n" + prefix, pos)
+    return -1 if found == -1 else found + 1
 
+def line_end(text: str, pos: int) -> int:
+    end = text.find("\n", pos)
+    return len(text) if end == -1 else end
+
+def closes_file_section(text: str, pos: int) -> bool:
+    """Whether the lines from `pos` are what follows a file's closing fence: an optional note, then any blank lines and the next header, or the end."""
+    if text.startswith(NOTE_PREFIX, pos):
+        pos = line_end(text, pos) + 1
+    while pos < len(text) and not text.startswith(FILE_HEADER, pos):
+        end = line_end(text, pos)
+        if text[pos:end].strip():
+            return False
+        pos = end + 1
+    return True
+
+def find_closing_fence(text: str, pos: int) -> int:
+    fence = find_line(text, FENCE, pos)
+    while fence != -1:
+        end = line_end(text, fence)
+        if text[fence:end].rstrip() == FENCE and closes_file_section(text, end + 1):
+            return fence
+        fence = find_line(text, FENCE, end + 1)
+    return -1
+
+def file_section(filename: str, first_line: str) -> Dict:
+    is_fenced = first_line.startswith(FENCE)
+    binary_note = None if is_fenced else BINARY_NOTE.match(first_line)
+    return {
+        "filename": filename,
+        "language": (first_line[len(FENCE):].strip() or 'text') if is_fenced else None,
+        "content": "",
+        "is_binary": not is_fenced and first_line.startswith("[Binary file - "),
+        "binary_size": binary_note.group(1) if binary_note else None,
+    }
+
+def iter_section_spans(text: str) -> Iterator[Tuple[int, int, Dict]]:
+    """Split a generated document into its file sections by index, in time linear in its length.
+
+    A file's code block ends at the first fence line followed by what create_markdown_document
+    writes after one: an optional "[Note: ...]" line, then blank lines (usually one) and the next
+    header, or the end of the document. Fences inside file contents therefore do not end the block. Sections
+    without a code block keep their text (a skip or error message) as content, except binaries.
+    Each section is yielded with the span of its text, from its header to the next one.
+    """
+    header = find_line(text, FILE_HEADER, 0)
+    while header != -1:
+        header_end = line_end(text, header)
+        body = header_end + 1
+        body_line_end = line_end(text, body) if body < len(text) else len(text)
+        section = file_section(text[header + len(FILE_HEADER):header_end].strip(), text[body:body_line_end])
+
+        if section['language'] is not None:
+            content_start = body_line_end + 1
+            fence = find_closing_fence(text, content_start)
+            if fence == -1:
+                content = text[content_start:]
+                section['content'] = content[:-1] if content.endswith("\n") else content
+                next_header = -1
+            else:
+                section['content'] = text[content_start:max(content_start, fence - 1)]
+                next_header = find_line(text, FILE_HEADER, line_end(text, fence) + 1)
+        else:
+            next_header = find_line(text, FILE_HEADER, body)
+            if not section['is_binary']:
+                section['content'] = text[body:len(text) if next_header == -1 else next_header].strip()
+
+        if section['filename']:
+            yield header, len(text) if next_header == -1 else next_header, section
+        header = next_header
+
+def iter_file_sections(text: str) -> Iterator[Dict]:
+    if "\r\n" in text:
+        text = text.replace("\r\n", "\n")
+    for _, _, section in iter_section_spans(text):
+        yield section
+
+def strip_newline(line: AnyStr, lf: AnyStr, cr: AnyStr) -> AnyStr:
+    if line.endswith(lf):
+        line = line[:-1]
+    return line[:-1] if line.endswith(cr) else line
+
+def iter_markdown_lines(source: Union[IO, mmap.mmap]) -> Iterator[Tuple[Optional[int], Optional[int], str]]:
+    """Yield (start, end, line) for each line of a document, without its newline or a trailing CR.
+
+    `source` may be a binary or text file object, or an mmap. Byte offsets are only known for
+    binary sources and are None otherwise.
+    """
+    lines = iter(source.readline, b'') if isinstance(source, mmap.mmap) else source
+    offset = 0
+    for raw in lines:
+        if isinstance(raw, str):
+            yield None, None, strip_newline(raw, '\n', '\r')
+            continue
+        start, offset = offset, offset + len(raw)
+        yield start, offset, strip_newline(raw, b'\n', b'\r').decode('utf-8', errors='replace')
+
+def iter_streamed_sections(source: Union[IO, mmap.mmap], index: Optional[Dict[str, Tuple[int, int]]] = None) -> Iterator[Dict]:
+    """Line-at-a-time counterpart of iter_file_sections for documents read from a file or mmap.
+
+    A fence line inside a code block is a closing candidate; the lines after it are kept until
+    the next header confirms it (after an optional note and any blank lines) or the document ends.
+    """
+    section, lines, section_start = None, [], None
+    opening, in_code = False, False
+    close_at, closing = 0, None
+    end = None
+
+    def finish(section_end: Optional[int]) -> Optional[Dict]:
+        if in_code:
+            if closing is not None:
+                del lines[close_at:]
+            section['content'] = "\n".join(lines)
+        elif not section['is_binary'] and section['language'] is None:
+            section['content'] = "\n".join(lines).strip()
+        if index is not None and section_end is not None and section['filename']:
+            index[section['filename']] = (section_start, section_end)
+        return section if section['filename'] else None
+
+    for start, end, line in iter_markdown_lines(source):
+        if line.startswith(FILE_HEADER) and (not in_code or closing is not None):
+            if section is not None and finish(start):
+                yield section
+            section, lines, section_start = file_section(line[len(FILE_HEADER):].strip(), ""), [], start
+            opening, in_code, closing = True, False, None
+            continue
+        if section is None:
+            continue
+        if opening:
+            opening = False
+            section = file_section(section['filename'], line)
+            in_code = section['language'] is not None
+            if in_code or section['is_binary']:
+                continue
+        elif in_code:
+            if line.rstrip() == FENCE:
+                close_at, closing = len(lines), 'fence'
+            elif closing == 'fence' and line.startswith(NOTE_PREFIX):
+                closing = 'note'
+            elif closing is not None and not line.strip():
+                closing = 'blank'
+            else:
+                closing = None
+        elif section['is_binary']:
+            continue
+        lines.append(line)
+
+    if section is not None and finish(end):
+        yield section
+
+def markdown_file_entry(section: Dict) -> Dict:
+    filename, is_binary = section['filename'], section['is_binary']
+    content = "[Binary File]" if is_binary else section['content'] if section['language'] is not None else ""
+    return {"filename": filename, "content": content, "is_binary": is_binary, "filepath": filename}
+
+def markdown_file_bytes(entry: Dict) -> bytes:
+    return b"[Binary content not stored]" if entry['is_binary'] else entry['content'].encode('utf-8')
+
+def iter_markdown_files(source: Union[str, IO, mmap.mmap], index: Optional[Dict[str, Tuple[int, int]]] = None) -> Iterator[Dict]:
+    """Parse a generated document incrementally, yielding one file entry per "### File:" section.
+
+    Strings are split with iter_file_sections. Files and mmaps are read a line at a time, so only
+    the section being parsed is held in memory, and `index` is filled with each file's
+    (start, end) byte range as a side effect.
+    """
+    sections = iter_file_sections(source) if isinstance(source, str) else iter_streamed_sections(source, index)
+    for section in metrics.traced("parse", sections):
+        yield markdown_file_entry(section)
+
+def markdown_to_files(markdown_text: Union[str, IO, mmap.mmap]) -> Tuple[Union[List[Dict], str], Dict[str, bytes]]:
+    files = list(iter_markdown_files(markdown_text))
     if not files:
         return "Error: No files found in the markdown document.", {}
-    return files, buffers
+    return files, {entry['filepath']: markdown_file_bytes(entry) for entry in files}
+
+def write_markdown_index(document_path: Union[str, Path], index: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, Tuple[int, int]]:
+    """Write the sidecar byte-offset index next to a document on disk, building it if not given."""
+    document_path = Path(document_path)
+    if index is None:
+        index = {}
+        with open(document_path, 'rb') as document:
+            for _ in iter_markdown_files(document, index):
+                pass
+    stat = document_path.stat()
+    sidecar = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "files": index}
+    Path(f"{document_path}{INDEX_SUFFIX}").write_text(json.dumps(sidecar), encoding='utf-8')
+    return index
+
+def load_markdown_index(document_path: Union[str, Path]) -> Dict[str, Tuple[int, int]]:
+    """Load a document's sidecar index, rebuilding it if missing or stale (the document's size or mtime changed)."""
+    document_path = Path(document_path)
+    try:
+        sidecar = json.loads(Path(f"{document_path}{INDEX_SUFFIX}").read_text(encoding='utf-8'))
+        stat = document_path.stat()
+        if sidecar["size"] == stat.st_size and sidecar["mtime_ns"] == stat.st_mtime_ns:
+            return {filepath: tuple(span) for filepath, span in sidecar["files"].items()}
+    except (OSError, ValueError, KeyError):
+        pass
+    return write_markdown_index(document_path)
+
+class MarkdownBundle(Mapping):
+    """Read-only mapping of file path to content bytes over a generated document on disk.
+
+    Lookups seek to the file's section using the sidecar index and parse only that section.
+    """
+
+    def __init__(self, document_path: Union[str, Path], index: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.document_path = Path(document_path)
+        self.index = index if index is not None else load_markdown_index(document_path)
+
+    def read_entry(self, filepath: str) -> Dict:
+        start, end = self.index[filepath]
+        with open(self.document_path, 'rb') as document:
+            document.seek(start)
+            section = document.read(end - start)
+        return next(iter_markdown_files(io.BytesIO(section)))
+
+    def iter_entries(self) -> Iterator[Dict]:
+        with open(self.document_path, 'rb') as document:
+            yield from iter_markdown_files(document)
+
+    def __getitem__(self, filepath: str) -> bytes:
+        return markdown_file_bytes(self.read_entry(filepath))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
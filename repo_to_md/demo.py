@@ -1,19 +1,32 @@
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, g
-from .core import create_markdown_document, markdown_to_files
+from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory, g, session
+from .core import get_github_head_commit, iter_file_sections, iter_markdown_document, iter_markdown_files, markdown_file_bytes
+from . import metrics
+from .jobs import Job, JobExpired, JobQueue, JobQueueFull
+from .metrics import MetricsRegistry, format_metric
+from .store import ReverseStore, iter_zip
 import os
 import io
-import zipfile
+import itertools
+import json
+import requests
 import tempfile
+import uuid
 import mimetypes
 import shutil
 import re
 import sys
 from pathlib import Path
-from typing import Dict
+from typing import Iterator, Mapping, Optional, Tuple
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
-reverse_buffers = {}
+reverse_store = ReverseStore(max_memory_bytes=int(os.getenv('REPO_TO_MD_REVERSE_MEMORY', str(64 * 1024 * 1024))))
+job_queue = JobQueue(max_workers=int(os.getenv('REPO_TO_MD_JOB_WORKERS', '2')),
+                     max_result_bytes=int(os.getenv('REPO_TO_MD_JOB_RESULT_BYTES', str(256 * 1024 * 1024))))
+# The dedupe key is resolved in the request thread, so a slow API must not hold up the submit
+REVISION_LOOKUP_TIMEOUT = 3.0
+# Registered by run_demo, so importing the package does not switch instrumentation on
+metrics_registry = MetricsRegistry()
 
 def find_template_path() -> str:
     possible_paths = [
@@ -26,7 +39,7 @@ def find_template_path() -> str:
             return str(path)
     raise FileNotFoundError("Template directory not found")
 
-def rebuild_html_content(html_content: bytes, buffers: Dict[str, bytes]) -> bytes:
+def rebuild_html_content(html_content: bytes, buffers: Mapping[str, bytes]) -> bytes:
     html_str = html_content.decode('utf-8', errors='replace')
     for pattern, tag in [
         (r'<script\s+src=["\']([^"\']+)["\'].*?</script>', "<script>\n{0}\n</script>"),
@@ -46,31 +59,108 @@ def extract_file_tree(markdown_text: str) -> str:
 
 def extract_file_blocks(markdown_text: str) -> list:
     """Extract file names and contents from Markdown, ensuring binary files are isolated."""
-    # Split the markdown into blocks starting with ### File:
     blocks = []
-    pattern = r'### File: (.+?)(?:\s+\[Binary file - (\d+) bytes\])?\n(?:```(\w+)?\n(.*?)\n```|Binary content not shown|(?=### File:)|$)'
-    matches = re.finditer(pattern, markdown_text, re.DOTALL)
-    
-    for match in matches:
-        filename = match.group(1).strip()
-        binary_size = match.group(2)  # Captures [Binary file - XXX bytes] if present
-        language = match.group(3) or 'text'
-        content = match.group(4) if match.group(4) else 'Binary content not shown'
-        
-        # Check if the filename contains "Binary file"
-        is_binary = "Binary file" in filename or content == 'Binary content not shown'
-        
+    for section in iter_file_sections(markdown_text):
+        is_binary, binary_size = section['is_binary'], section['binary_size']
         blocks.append({
-            'filename': filename,
-            'language': 'binary' if is_binary else language,
-            'content': f"Binary content [File size: {binary_size or 'unknown'} bytes]" if is_binary else content.strip(),
+            'filename': section['filename'],
+            'language': 'binary' if is_binary else section['language'] or 'text',
+            'content': f"Binary content [File size: {binary_size or 'unknown'} bytes]" if is_binary else section['content'].strip(),
             'is_binary': is_binary,
             'binary_size': binary_size
         })
-    
     return blocks
 
+def reverse_session_id() -> str:
+    if 'reverse_id' not in session:
+        session['reverse_id'] = uuid.uuid4().hex
+    return session['reverse_id']
+
+def wants_stream() -> bool:
+    data = request.get_json(silent=True) or {}
+    flag = request.args.get('stream') or request.form.get('stream') or data.get('stream')
+    return str(flag).lower() in ('1', 'true')
+
+def detach_uploads(files: list) -> list:
+    """Copy uploads out of the request, whose file streams are closed before a streamed response runs."""
+    detached = []
+    for file in files:
+        buffer = io.BytesIO(file.read())
+        buffer.filename = file.filename
+        detached.append(buffer)
+    return detached
+
+def resolve_revision(repo_url: str, owner: str, repo: str) -> Optional[str]:
+    """Head commit of a GitHub repository's default branch, so a finished build is only shared while it is current.
+
+    One request, without retries or rate-limit waits; None, so builds are shared by URL alone, if it fails.
+    """
+    if "huggingface.co" in repo_url.lower():
+        return None
+    try:
+        return get_github_head_commit(owner, repo, retry=False, timeout=REVISION_LOOKUP_TIMEOUT)
+    except requests.RequestException:
+        return None
+
+def submit_document_job() -> Tuple[Optional[Job], Optional[Tuple[Response, int]]]:
+    """Start, or join, the build a /process-style request asks for; returns the job or an error response."""
+    try:
+        if 'files[]' in request.files:
+            files = request.files.getlist('files[]')
+            if not files:
+                return None, (jsonify({'error': 'No files uploaded'}), 400)
+            files = detach_uploads(files)
+            return job_queue.submit(lambda progress: iter_markdown_document(files=files, progress=progress),
+                                    filename="uploaded_files_summary.md"), None
+        data = request.get_json(silent=True) or {}
+        repo_url = data.get('repo_url', '').strip()
+        if not repo_url:
+            return None, (jsonify({'error': 'Please provide a repository URL or upload files'}), 400)
+        parts = repo_url.rstrip('/').split('/')
+        if len(parts) < 2 or not all(parts[-2:]):
+            return None, (jsonify({'error': 'Please provide a repository URL like https://github.com/owner/repo'}), 400)
+        owner, repo = parts[-2:]
+        archive = bool(data.get('archive'))
+        return job_queue.submit(lambda progress: iter_markdown_document(repo_url, archive=archive, progress=progress),
+                                key=(repo_url.rstrip('/'), archive, resolve_revision(repo_url, owner, repo)),
+                                filename=f"{owner}_{repo}_summary.md"), None
+    except JobQueueFull as e:
+        return None, (jsonify({'error': str(e)}), 503)
+
+def job_result(job: Job) -> Tuple[Response, int]:
+    if job.status == 'error':
+        return jsonify({'error': job.error}), 400
+    try:
+        markdown_content = job.markdown()
+    except JobExpired as e:
+        return jsonify({'error': str(e)}), 410
+    return jsonify({'markdown': markdown_content, 'filename': job.filename, 'files': extract_file_blocks(markdown_content)}), 200
+
+def stream_job(job: Job) -> Iterator[str]:
+    """Serialise a job as NDJSON: a filename line, progress lines and one line per chunk with its file blocks, then a done or error line."""
+    yield json.dumps({'job_id': job.id, 'filename': job.filename}) + "\n"
+    try:
+        for kind, value in job.follow():
+            if kind == 'chunk':
+                yield json.dumps({'markdown': value, 'files': extract_file_blocks(value)}) + "\n"
+            else:
+                yield json.dumps({'progress': value}) + "\n"
+    except JobExpired as e:
+        yield json.dumps({'error': str(e)}) + "\n"
+        return
+    yield json.dumps({'error': job.error} if job.status == 'error' else {'done': True}) + "\n"
+
+def render_metrics() -> str:
+    lines = format_metric("repo_to_md_jobs", "gauge", "Document jobs currently held, by status.",
+                          (({'status': status}, count) for status, count in sorted(job_queue.counts().items())))
+    lines += format_metric("repo_to_md_job_result_bytes", "gauge", "Bytes of document output held on disk by jobs.",
+                           [({}, job_queue.result_bytes())])
+    lines += format_metric("repo_to_md_reverse_store_memory_bytes", "gauge", "Bytes of extracted files held in memory.",
+                           [({}, reverse_store.memory_bytes)])
+    return metrics_registry.render() + "\n".join(lines) + "\n"
+
 def run_demo(host: str = "0.0.0.0", port: int = 7860, debug: bool = True) -> None:
+    metrics.add_hook(metrics_registry)
     app.template_folder = find_template_path()
     app.static_folder = str(Path(app.template_folder).parent / "static")
 
@@ -89,66 +179,124 @@ def run_demo(host: str = "0.0.0.0", port: int = 7860, debug: bool = True) -> Non
 
     @app.route('/process', methods=['POST'])
     def process():
-        if 'files[]' in request.files:
-            files = request.files.getlist('files[]')
-            if not files:
-                return jsonify({'error': 'No files uploaded'}), 400
-            markdown_content = create_markdown_document(files=files)
-            filename = "uploaded_files_summary.md"
-        else:
-            repo_url = request.json.get('repo_url', '').strip()
-            if not repo_url:
-                return jsonify({'error': 'Please provide a repository URL or upload files'}), 400
-            markdown_content = create_markdown_document(repo_url)
-            if markdown_content.startswith("Error:"):
-                return jsonify({'error': markdown_content}), 400
-            owner, repo = repo_url.rstrip('/').split('/')[-2:]
-            filename = f"{owner}_{repo}_summary.md"
-        file_blocks = extract_file_blocks(markdown_content)
-        return jsonify({'markdown': markdown_content, 'filename': filename, 'files': file_blocks})
+        job, error = submit_document_job()
+        if error:
+            return error
+        if wants_stream():
+            return Response(stream_job(job), mimetype='application/x-ndjson')
+        job.wait()
+        return job_result(job)
+
+    @app.route('/jobs', methods=['POST'])
+    def submit_job():
+        job, error = submit_document_job()
+        if error:
+            return error
+        return jsonify(job.snapshot()), 202
+
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        status = job.snapshot()
+        if job.status == 'done':
+            try:
+                markdown_content = job.markdown()
+            except JobExpired as e:
+                return jsonify({'error': str(e)}), 410
+            status.update({'markdown': markdown_content, 'files': extract_file_blocks(markdown_content)})
+        return jsonify(status)
+
+    @app.route('/jobs/<job_id>/events')
+    def job_events(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return Response(stream_job(job), mimetype='application/x-ndjson')
 
     @app.route('/download', methods=['POST'])
     def download():
         data = request.json
+        if 'markdown' not in data and data.get('repo_url', '').strip():
+            job, error = submit_document_job()
+            if error:
+                return error
+            chunks = (value for kind, value in job.follow() if kind == 'chunk')
+            try:
+                first = next(chunks, None)
+            except JobExpired as e:
+                return jsonify({'error': str(e)}), 410
+            if first is None:
+                return jsonify({'error': job.error}), 400
+            download_name = data.get('filename', job.filename)
+            return Response(
+                itertools.chain([first], chunks),
+                mimetype='text/markdown',
+                headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+            )
         buffer = io.BytesIO(data['markdown'].encode('utf-8'))
         return send_file(buffer, as_attachment=True, download_name=data.get('filename', 'document.md'), mimetype='text/markdown')
 
     @app.route('/reverse', methods=['POST'])
     def reverse():
-        global reverse_buffers
-        markdown_text = (
-            request.files.get('markdown_file', {}).read().decode('utf-8', errors='replace') or
-            request.form.get('markdown_text', '')
-        )
-        if not markdown_text.strip():
+        # The upload is spooled to disk and parsed a file at a time into this session's store
+        document_path = Path(g.temp_dir) / "document.md"
+        upload = request.files.get('markdown_file')
+        if upload and upload.filename:
+            upload.save(str(document_path))
+        else:
+            document_path.write_text(request.form.get('markdown_text', ''), encoding='utf-8')
+        if not document_path.stat().st_size:
             return jsonify({'error': 'No Markdown data provided', 'files': [], 'combined_html': '<p>Please provide Markdown input.</p>'}), 400
 
-        files, buffers = markdown_to_files(markdown_text)
-        if isinstance(files, str):
-            return jsonify({'error': files, 'files': [], 'combined_html': '<p>Invalid Markdown format.</p>'}), 400
+        session_id = reverse_session_id()
+        # Only metadata is returned; the UI fetches each file's content through /download_file
+        index, files = {}, []
+
+        def extracted() -> Iterator[Tuple[str, bytes]]:
+            for entry in iter_markdown_files(document, index):
+                content = markdown_file_bytes(entry)
+                files.append({'filename': entry['filename'], 'filepath': entry['filepath'], 'size': len(content), 'is_binary': entry['is_binary']})
+                yield entry['filepath'], content
 
-        reverse_buffers.clear()
-        reverse_buffers.update({k: v.encode('utf-8') if isinstance(v, str) else v for k, v in buffers.items()})
+        with open(document_path, 'rb') as document:
+            reverse_store.replace(session_id, extracted())
+        if not files:
+            return jsonify({'error': 'Error: No files found in the markdown document.', 'files': [], 'combined_html': '<p>Invalid Markdown format.</p>'}), 400
+
+        stored_files = reverse_store.view(session_id)
         combined_html = ""
         has_html = False
 
         for file_info in files:
             if not file_info['is_binary'] and file_info['filename'].endswith(".html"):
+                try:
+                    html_content = rebuild_html_content(stored_files[file_info['filepath']], stored_files)
+                except KeyError:
+                    # Dropped from the store meanwhile
+                    continue
                 has_html = True
-                html_content = rebuild_html_content(reverse_buffers[file_info['filepath']], reverse_buffers)
                 filepath = Path(g.temp_dir) / file_info['filepath']
                 filepath.parent.mkdir(parents=True, exist_ok=True)
                 filepath.write_bytes(html_content)
                 combined_html += f"<iframe src='/temp/{file_info['filepath']}' style='width:100%; height:400px; border:1px solid #ddd;'></iframe>"
 
         if not has_html:
+            # The file structure section precedes the first file section
+            with open(document_path, 'rb') as document:
+                head = document.read(min(start for start, _ in index.values()))
             tree_path = Path(g.temp_dir) / "file_tree.html"
-            tree_html = f"<!DOCTYPE html><html><body>{extract_file_tree(markdown_text)}</body></html>"
+            tree_html = f"<!DOCTYPE html><html><body>{extract_file_tree(head.decode('utf-8', errors='replace'))}</body></html>"
             tree_path.write_text(tree_html, encoding='utf-8')
             combined_html = f"<iframe src='/temp/file_tree.html' style='width:100%; height:400px; border:1px solid #ddd;'></iframe>"
 
         return jsonify({'files': files, 'combined_html': combined_html, 'error': None})
 
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
     @app.route('/temp/<path:filename>')
     def temp_files(filename):
         return send_from_directory(g.temp_dir, filename)
@@ -156,10 +304,11 @@ def run_demo(host: str = "0.0.0.0", port: int = 7860, debug: bool = True) -> Non
     @app.route('/download_file', methods=['POST'])
     def download_file():
         filepath = request.json.get('filepath')
-        if filepath not in reverse_buffers:
+        stored = reverse_store.open(reverse_session_id(), filepath)
+        if stored is None:
             return jsonify({'error': 'File not found'}), 404
         return send_file(
-            io.BytesIO(reverse_buffers[filepath]),
+            stored,
             as_attachment=True,
             download_name=Path(filepath).name,
             mimetype=mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
@@ -167,14 +316,16 @@ def run_demo(host: str = "0.0.0.0", port: int = 7860, debug: bool = True) -> Non
 
     @app.route('/download_extracted', methods=['POST'])
     def download_extracted():
-        if not reverse_buffers:
+        session_id = reverse_session_id()
+        filepaths = reverse_store.filepaths(session_id)
+        if not filepaths:
             return jsonify({'error': 'No files available'}), 400
-        buffer = io.BytesIO()
-        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for filepath, content in reverse_buffers.items():
-                zip_file.writestr(filepath, content if isinstance(content, bytes) else content.encode('utf-8'))
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name="extracted_files.zip", mimetype='application/zip')
+        opened = ((filepath, reverse_store.open(session_id, filepath)) for filepath in filepaths)
+        return Response(
+            iter_zip((filepath, stored) for filepath, stored in opened if stored is not None),
+            mimetype='application/zip',
+            headers={'Content-Disposition': 'attachment; filename="extracted_files.zip"'}
+        )
 
     app.run(host=host, port=port, debug=debug)
 
@@ -0,0 +1,158 @@
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+def translate_pattern(pattern: str) -> Tuple[str, bool]:
+    """Translate one gitignore pattern into a regex over relative paths and a directory-only flag."""
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    # A slash anywhere but the end anchors the pattern to its .gitignore's directory
+    anchored = '/' in pattern
+    parts = pattern.lstrip('/').split('/')
+
+    regex = '' if anchored else '(?:.*/)?'
+    for index, part in enumerate(parts):
+        last = index == len(parts) - 1
+        if part == '**':
+            regex += '.*' if last else '(?:.*/)?'
+            continue
+        regex += translate_segment(part) + ('' if last else '/')
+    return regex, dir_only
+
+def translate_segment(segment: str) -> str:
+    regex, i = '', 0
+    while i < len(segment):
+        char = segment[i]
+        if char == '\\' and i + 1 < len(segment):
+            regex += re.escape(segment[i + 1])
+            i += 2
+            continue
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[':
+            start = i + 1
+            if segment[start:start + 1] in ('!', '^'):
+                start += 1
+            # A ']' right after the opening bracket is part of the set
+            if segment[start:start + 1] == ']':
+                start += 1
+            end = segment.find(']', start)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = segment[i + 1:end]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                regex += '[' + body.replace('\\', '\\\\') + ']'
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+class PathMatcher:
+    """Gitignore-style matcher over '/'-separated relative paths.
+
+    Patterns are compiled once; consecutive rules with the same polarity and base are merged into
+    a single regex. Directory decisions are cached, so every file under an excluded directory is
+    rejected with one lookup, and `filter` skips the rest of a pruned subtree in sorted listings
+    without matching at all.
+
+    Rules added with ``final=True`` form a layer of their own that is consulted first: whatever it
+    excludes stays excluded, however the other rules, such as a repository's .gitignore, negate it.
+    Rules added with ``files_only=True`` never match directories.
+    """
+
+    def __init__(self, patterns: Iterable[str] = (), base: str = ""):
+        self._pending = []
+        self._rules = None
+        self._dir_cache = {}
+        self.add_patterns(patterns, base)
+
+    def add_patterns(self, patterns: Iterable[str], base: str = "", final: bool = False, files_only: bool = False) -> None:
+        base = base.strip('/')
+        for line in patterns:
+            line = line.rstrip('\n').rstrip('\r')
+            # Trailing spaces are ignored unless escaped
+            stripped = line.rstrip(' ')
+            if stripped.endswith('\\') and len(stripped) < len(line):
+                stripped += ' '
+            if not stripped.strip('/') or stripped.startswith('#'):
+                continue
+            negate = stripped.startswith('!')
+            if negate or stripped.startswith('\\!') or stripped.startswith('\\#'):
+                stripped = stripped[1:]
+            regex, dir_only = translate_pattern(stripped)
+            self._pending.append((regex, negate, dir_only, files_only, base, final))
+        self._rules = None
+        self._dir_cache.clear()
+
+    def add_gitignore(self, text: str, base: str = "") -> None:
+        self.add_patterns(text.splitlines(), base)
+
+    def _compile(self) -> List:
+        layers = []
+        for final in (True, False):
+            rules = []
+            for regex, negate, dir_only, files_only, base, rule_final in self._pending:
+                if rule_final is not final:
+                    continue
+                key = (negate, dir_only, files_only, base)
+                if rules and rules[-1][0] == key:
+                    rules[-1][1].append(regex)
+                else:
+                    rules.append((key, [regex]))
+            compiled = []
+            for (negate, dir_only, files_only, base), regexes in reversed(rules):
+                prefix = re.escape(base + '/') if base else ''
+                compiled.append((re.compile(f"{prefix}(?:{'|'.join(regexes)})"), negate, dir_only, files_only))
+            if compiled:
+                layers.append(compiled)
+        self._rules = layers
+        return layers
+
+    def matches(self, path: str, is_dir: bool = False) -> bool:
+        """Return whether `path` itself is ignored; within each layer the last matching rule wins."""
+        layers = self._rules if self._rules is not None else self._compile()
+        for rules in layers:
+            for pattern, negate, dir_only, files_only in rules:
+                if (dir_only and not is_dir) or (files_only and is_dir):
+                    continue
+                if pattern.fullmatch(path):
+                    if not negate:
+                        return True
+                    # Re-included by this layer; a later layer may still exclude it
+                    break
+        return False
+
+    def excluded_ancestor(self, path: str) -> Optional[str]:
+        """Return the highest excluded directory containing `path`, if any."""
+        end = path.find('/')
+        while end != -1:
+            directory = path[:end]
+            excluded = self._dir_cache.get(directory)
+            if excluded is None:
+                excluded = self._dir_cache[directory] = self.matches(directory, is_dir=True)
+            if excluded:
+                return directory
+            end = path.find('/', end + 1)
+        return None
+
+    def is_excluded(self, path: str) -> bool:
+        # As in git, nothing under an excluded directory can be re-included
+        return self.excluded_ancestor(path) is not None or self.matches(path)
+
+    def filter(self, items: Iterable, key: Callable = None) -> Iterator:
+        """Yield the items whose path (``key(item)``, or the item itself) is not excluded."""
+        pruned = None
+        for item in items:
+            path = key(item) if key else item
+            if pruned is not None and path.startswith(pruned):
+                continue
+            ancestor = self.excluded_ancestor(path)
+            if ancestor is not None:
+                pruned = ancestor + '/'
+                continue
+            if not self.matches(path):
+                yield item
@@ -0,0 +1,224 @@
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Hashable, Iterator, Optional, Tuple, Union
+
+# A build takes a progress callback and yields document chunks, like iter_markdown_document
+Build = Callable[[Callable[[int, Optional[int]], None]], Iterator[str]]
+
+class JobQueueFull(Exception):
+    pass
+
+class JobExpired(Exception):
+    """The job's result was evicted from the queue before it could be read."""
+
+class Job:
+    """One document build running in the background: the output produced so far, progress and outcome.
+
+    Chunks are appended to a file in `directory` as they are produced and read back from it, so
+    neither the job nor the clients following it hold the document in memory; only the offset
+    at which each chunk ends is kept.
+    """
+
+    def __init__(self, key: Optional[Hashable], filename: str, directory: Union[str, Path]):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.filename = filename
+        self.status = 'queued'
+        self.error = None
+        self.chunk_ends = []
+        self.files_done = 0
+        self.files_total = None
+        self.bytes = 0
+        self.created = time.time()
+        self.finished = None
+        self.expired = False
+        self.path = Path(directory) / f"{self.id}.md"
+        self._writer = open(self.path, 'wb')
+        self._condition = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('done', 'error')
+
+    def _open(self) -> BinaryIO:
+        # Opened under the lock, so discard() cannot remove the file in between
+        with self._condition:
+            if self.expired:
+                raise JobExpired(f"The result of job {self.id} has expired")
+            return open(self.path, 'rb')
+
+    def markdown(self) -> str:
+        """The document so far, read back in one piece."""
+        with self._open() as reader:
+            return reader.read(self.bytes).decode('utf-8')
+
+    def progress(self) -> Dict:
+        with self._condition:
+            return {"files_done": self.files_done, "files_total": self.files_total, "bytes": self.bytes}
+
+    def snapshot(self) -> Dict:
+        with self._condition:
+            return {"job_id": self.id, "status": self.status, "filename": self.filename, "error": self.error,
+                    "progress": {"files_done": self.files_done, "files_total": self.files_total, "bytes": self.bytes}}
+
+    def report(self, files_done: int, files_total: Optional[int]) -> None:
+        with self._condition:
+            self.files_done, self.files_total = files_done, files_total
+            self._condition.notify_all()
+
+    def _append(self, chunk: str) -> None:
+        data = chunk.encode('utf-8')
+        # Written and flushed before it is announced, so followers only read whole chunks
+        self._writer.write(data)
+        self._writer.flush()
+        with self._condition:
+            self.bytes += len(data)
+            self.chunk_ends.append(self.bytes)
+            self._condition.notify_all()
+
+    def _set_status(self, status: str, error: Optional[str] = None) -> None:
+        with self._condition:
+            self.status, self.error = status, error
+            if self.done:
+                self.finished = time.time()
+            self._condition.notify_all()
+
+    def run(self, build: Build) -> None:
+        self._set_status('running')
+        status, error = 'done', None
+        try:
+            for chunk in build(self.report):
+                if not self.chunk_ends and chunk.startswith("Error:"):
+                    status, error = 'error', chunk
+                    break
+                self._append(chunk)
+        except Exception as e:
+            status, error = 'error', f"Error: {e}"
+        finally:
+            self._writer.close()
+        self._set_status(status, error)
+
+    def discard(self) -> None:
+        """Delete the job's output; readers that already opened it can finish."""
+        with self._condition:
+            self.expired = True
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self.done, timeout)
+
+    def follow(self, heartbeat: float = 15.0) -> Iterator[Tuple[str, object]]:
+        """Yield ("chunk", text) and ("progress", dict) events as the job runs, replaying earlier chunks first.
+
+        A ("progress", dict) event is also repeated every `heartbeat` seconds without news, which
+        keeps proxies from timing out long idle streams. Ends once the job has finished. Chunks are
+        read from the job's file one at a time; raises JobExpired if it is already gone.
+        """
+        with self._open() as reader:
+            sent, reported = 0, None
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self.done or len(self.chunk_ends) > sent or (self.files_done, self.files_total) != reported,
+                        heartbeat
+                    )
+                    start = self.chunk_ends[sent - 1] if sent else 0
+                    ends = self.chunk_ends[sent:]
+                    finished = self.done
+                    reported = (self.files_done, self.files_total)
+                sent += len(ends)
+                for end in ends:
+                    yield "chunk", reader.read(end - start).decode('utf-8')
+                    start = end
+                yield "progress", self.progress()
+                if finished:
+                    return
+
+class JobQueue:
+    """Runs document builds on a bounded thread pool, sharing work between identical requests.
+
+    Submitting with a `key` already queued, running or finished within `result_ttl` seconds
+    returns that job instead of starting another, so concurrent requests for the same repository
+    and revision share one build and its result. Failed jobs are not shared. Output is kept in
+    files under `directory` (a new temporary directory by default). The oldest finished jobs are
+    dropped beyond `max_finished` of them or `max_result_bytes` of output between them, and
+    `max_pending` bounds the jobs waiting for a worker.
+    """
+
+    def __init__(self, max_workers: int = 2, result_ttl: float = 600.0, max_finished: int = 32, max_pending: int = 64,
+                 max_result_bytes: int = 256 * 1024 * 1024, directory: Optional[Union[str, Path]] = None):
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self.max_pending = max_pending
+        self.max_result_bytes = max_result_bytes
+        self.directory = Path(directory or tempfile.mkdtemp(prefix="repo_to_md-jobs-"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="repo_to_md-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._by_key = {}
+
+    def _forget(self, job: Job) -> None:
+        self._jobs.pop(job.id, None)
+        if job.key is not None and self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+        job.discard()
+
+    def _expire(self) -> None:
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished:
+            if now - job.finished > self.result_ttl:
+                self._forget(job)
+        finished = [job for job in finished if job.id in self._jobs]
+        excess = len(finished) - self.max_finished
+        total = sum(job.bytes for job in finished)
+        for job in finished:
+            if excess <= 0 and total <= self.max_result_bytes:
+                break
+            self._forget(job)
+            excess -= 1
+            total -= job.bytes
+
+    def submit(self, build: Build, key: Optional[Hashable] = None, filename: str = "document.md") -> Job:
+        with self._lock:
+            self._expire()
+            job = self._by_key.get(key) if key is not None else None
+            if job is not None and job.status != 'error':
+                return job
+            if sum(job.status == 'queued' for job in self._jobs.values()) >= self.max_pending:
+                raise JobQueueFull("Too many jobs are waiting; try again later.")
+            job = Job(key, filename, self.directory)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job
+            self._executor.submit(job.run, build)
+            return job
+
+    def result_bytes(self) -> int:
+        """Bytes of output held on disk by the jobs not yet dropped."""
+        with self._lock:
+            return sum(job.bytes for job in self._jobs.values())
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs held by status: queued, running, and finished ones not yet expired."""
+        with self._lock:
+            self._expire()
+            counts = {'queued': 0, 'running': 0, 'done': 0, 'error': 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
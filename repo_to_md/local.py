@@ -0,0 +1,109 @@
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .ignore import PathMatcher
+
+def read_local_file(path: Union[str, Path], limit: Optional[int] = None) -> bytes:
+    """Read a file, or its first `limit` bytes."""
+    with open(path, 'rb') as file:
+        return file.read(-1 if limit is None else limit)
+
+def iter_local_files(root: Union[str, Path], matcher: PathMatcher, use_gitignore: bool = True) -> Iterator[Tuple[str, int, Callable[[Optional[int]], bytes]]]:
+    """Walk a directory, yielding (path, size, read) for each non-excluded file in Git's tree order.
+
+    Excluded directories are never entered. With `use_gitignore`, each directory's .gitignore is
+    added to `matcher` before its entries are matched. Symlinks are not followed; like Git, their
+    content is the link target. ``read(limit)`` returns up to `limit` bytes (all for None).
+    """
+    root = os.fspath(root)
+
+    def scan(directory: str) -> Iterator[os.DirEntry]:
+        with os.scandir(os.path.join(root, directory)) as entries:
+            # Git orders a directory as if its name ended in "/"
+            entries = sorted(entries, key=lambda entry: entry.name + '/' if entry.is_dir(follow_symlinks=False) else entry.name)
+        if use_gitignore:
+            for entry in entries:
+                if entry.name == '.gitignore' and entry.is_file(follow_symlinks=False):
+                    matcher.add_gitignore(read_local_file(entry.path).decode('utf-8', errors='replace'), base=directory)
+        return iter(entries)
+
+    stack = [("", scan(""))]
+    while stack:
+        directory, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        path = f"{directory}/{entry.name}" if directory else entry.name
+        if entry.is_dir(follow_symlinks=False):
+            if not matcher.matches(path, is_dir=True):
+                try:
+                    stack.append((path, scan(path)))
+                except PermissionError:
+                    pass
+        elif matcher.matches(path):
+            continue
+        elif entry.is_symlink():
+            target = os.readlink(entry.path).encode('utf-8', errors='surrogateescape')
+            yield path, len(target), lambda limit, target=target: target[:limit]
+        elif entry.is_file(follow_symlinks=False):
+            size = entry.stat(follow_symlinks=False).st_size
+            yield path, size, lambda limit, file_path=entry.path: read_local_file(file_path, limit)
+
+def list_git_tree(repo: Union[str, Path], revision: str) -> List[Dict]:
+    """List the blobs at `revision` with their SHA and size, as the GitHub listing does.
+
+    Only the part of the tree below `repo` is listed, with paths relative to it, so a
+    subdirectory of a repository is converted the same way as in directory mode.
+    """
+    output = subprocess.run(
+        ["git", "-C", os.fspath(repo), "ls-tree", "-r", "-l", "-z", revision],
+        capture_output=True, check=True
+    ).stdout
+    files = []
+    for record in output.split(b'\0'):
+        if not record:
+            continue
+        meta, _, path = record.partition(b'\t')
+        mode, kind, sha, size = meta.split()
+        # Submodules are listed as commits and have no content here
+        if kind == b'blob':
+            files.append({"path": path.decode('utf-8', errors='replace'), "sha": sha.decode(), "size": int(size)})
+    return files
+
+class GitObjectReader:
+    """Reads blobs from a repository's object database through one ``git cat-file --batch`` process."""
+
+    def __init__(self, repo: Union[str, Path]):
+        self._process = subprocess.Popen(
+            ["git", "-C", os.fspath(repo), "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self._lock = threading.Lock()
+
+    def read(self, sha: str) -> bytes:
+        with self._lock:
+            self._process.stdin.write(sha.encode() + b'\n')
+            self._process.stdin.flush()
+            header = self._process.stdout.readline().split()
+            if len(header) != 3:
+                raise OSError(f"Git object {sha} is missing")
+            content = self._process.stdout.read(int(header[2]))
+            # Each object is followed by a newline
+            self._process.stdout.read(1)
+            return content
+
+    def close(self) -> None:
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+        self._process.stdout.close()
+
+    def __enter__(self) -> "GitObjectReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,210 @@
+import bisect
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+# A hook receives every measurement as (stage, seconds, attributes)
+Hook = Callable[[str, float, Dict], None]
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Replaced rather than mutated, so emitters can iterate it without a lock
+_hooks: Tuple[Hook, ...] = ()
+_hooks_lock = threading.Lock()
+
+def add_hook(hook: Hook) -> Hook:
+    """Start calling ``hook(stage, seconds, attributes)`` for every measurement; returns `hook`.
+
+    Adding a hook that is already registered does nothing.
+    """
+    global _hooks
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+    return hook
+
+def remove_hook(hook: Hook) -> None:
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(registered for registered in _hooks if registered is not hook)
+
+def enabled() -> bool:
+    return bool(_hooks)
+
+def emit(stage: str, seconds: float, **attributes) -> None:
+    for hook in _hooks:
+        hook(stage, seconds, attributes)
+
+class Span:
+    """Times a ``with`` block and reports it to the hooks on exit; set() adds attributes on the way."""
+    __slots__ = ('stage', 'attributes', 'started')
+
+    def __init__(self, stage: str, attributes: Dict):
+        self.stage = stage
+        self.attributes = attributes
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        emit(self.stage, time.perf_counter() - self.started, **self.attributes)
+
+class NullSpan:
+    """Stands in for Span while no hooks are registered, so untraced runs only pay for a method call."""
+    __slots__ = ()
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+NULL_SPAN = NullSpan()
+
+def span(stage: str, **attributes):
+    return Span(stage, attributes) if _hooks else NULL_SPAN
+
+def traced(stage: str, items: Iterable) -> Iterator:
+    """Pass `items` through, reporting the time taken to produce each one (not the time spent consuming it)."""
+    if not _hooks:
+        return iter(items)
+    return _traced(stage, iter(items))
+
+def _traced(stage: str, items: Iterator) -> Iterator:
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        emit(stage, time.perf_counter() - started)
+        yield item
+
+def format_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+def format_value(value: float) -> str:
+    """A sample value at full precision: integers as they are, floats by repr."""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+def format_metric(name: str, kind: str, help_text: str, samples: Iterable[Tuple[Dict[str, object], float]]) -> List[str]:
+    """Lines of one metric in the Prometheus text format."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{format_labels(labels)} {format_value(value)}" for labels, value in samples)
+    return lines
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.total = 0.0
+        self.count = 0
+
+class MetricsRegistry:
+    """A hook aggregating measurements into per-stage latency histograms and counters.
+
+    Besides stage timings it totals the ``bytes_in`` and ``bytes_out`` attributes per stage, counts
+    HTTP requests by host and status and retries by host from "request" measurements, keeps the
+    last ``remaining`` rate-limit quota seen per host, and counts "cache" hits and misses.
+    render() produces the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, prefix: str = "repo_to_md"):
+        self.buckets = buckets
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._bytes_in = defaultdict(int)
+        self._bytes_out = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._requests = defaultdict(int)
+        self._retries = defaultdict(int)
+        self._remaining = {}
+        self._cache = defaultdict(int)
+
+    def __call__(self, stage: str, seconds: float, attributes: Dict) -> None:
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(len(self.buckets) + 1)
+            histogram.counts[bucket] += 1
+            histogram.total += seconds
+            histogram.count += 1
+            if attributes.get('bytes_in'):
+                self._bytes_in[stage] += attributes['bytes_in']
+            if attributes.get('bytes_out'):
+                self._bytes_out[stage] += attributes['bytes_out']
+            if 'error' in attributes:
+                self._errors[stage] += 1
+            if stage == 'request':
+                host = attributes.get('host', '')
+                self._requests[(host, str(attributes.get('status', '')))] += 1
+                if attributes.get('retry'):
+                    self._retries[host] += 1
+                if attributes.get('remaining') is not None:
+                    self._remaining[host] = attributes['remaining']
+            elif stage == 'cache':
+                self._cache['hit' if attributes.get('hit') else 'miss'] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "stages": {stage: {"count": histogram.count, "seconds": histogram.total} for stage, histogram in self._histograms.items()},
+                "bytes_in": dict(self._bytes_in),
+                "bytes_out": dict(self._bytes_out),
+                "requests": sum(self._requests.values()),
+                "retries": sum(self._retries.values()),
+                "rate_limit_remaining": dict(self._remaining),
+                "cache": dict(self._cache),
+            }
+
+    def render(self) -> str:
+        name = lambda metric: f"{self.prefix}_{metric}"
+        with self._lock:
+            lines = [f"# HELP {name('stage_seconds')} Time spent in each pipeline stage.",
+                     f"# TYPE {name('stage_seconds')} histogram"]
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float('inf')), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                    lines.append(f"{name('stage_seconds')}_bucket{format_labels({'stage': stage, 'le': le})} {cumulative}")
+                lines.append(f"{name('stage_seconds')}_sum{format_labels({'stage': stage})} {format_value(histogram.total)}")
+                lines.append(f"{name('stage_seconds')}_count{format_labels({'stage': stage})} {histogram.count}")
+            lines += format_metric(name('stage_bytes_in_total'), 'counter', "Bytes read by each pipeline stage.",
+                                   (({'stage': stage}, count) for stage, count in sorted(self._bytes_in.items())))
+            lines += format_metric(name('stage_bytes_out_total'), 'counter', "Bytes produced by each pipeline stage.",
+                                   (({'stage': stage}, count) for stage, count in sorted(self._bytes_out.items())))
+            lines += format_metric(name('stage_errors_total'), 'counter', "Pipeline stages that raised.",
+                                   (({'stage': stage}, count) for stage, count in sorted(self._errors.items())))
+            lines += format_metric(name('http_requests_total'), 'counter', "HTTP requests sent, by host and status.",
+                                   (({'host': host, 'status': status}, count) for (host, status), count in sorted(self._requests.items())))
+            lines += format_metric(name('http_retries_total'), 'counter', "HTTP requests that were retries, by host.",
+                                   (({'host': host}, count) for host, count in sorted(self._retries.items())))
+            lines += format_metric(name('rate_limit_remaining'), 'gauge', "Last X-RateLimit-Remaining seen, by host.",
+                                   (({'host': host}, remaining) for host, remaining in sorted(self._remaining.items())))
+            lines += format_metric(name('cache_lookups_total'), 'counter', "Blob cache lookups, by result.",
+                                   (({'result': result}, count) for result, count in sorted(self._cache.items())))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,239 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from . import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RateLimitExceeded(requests.HTTPError):
+    """Raised instead of sending a request when a host's quota is spent for longer than the scheduler will wait."""
+
+class HostLimit:
+    """Concurrency window and last-seen rate-limit quota for one host."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.remaining = None
+        self.reset_at = None
+        self.condition = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.in_flight < self.limit, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+class RequestScheduler:
+    """Sends every HTTP request through per-host concurrency limits, retries and conditional GETs.
+
+    Each host's concurrency window grows by one per successful response up to `max_concurrency`,
+    halves when the host throttles, and is scaled down as ``X-RateLimit-Remaining`` drops below
+    `low_water`. Once the quota is spent, requests wait for ``X-RateLimit-Reset`` if that is within
+    `max_wait` seconds and fail with RateLimitExceeded otherwise. Throttled, 5xx and dropped
+    requests are retried with jittered exponential backoff, honouring ``Retry-After``.
+
+    stats() counts requests, retries, 304s, throttled responses and body bytes received; bodies
+    of ``stream=True`` requests are only counted once the caller reports them with count_bytes().
+
+    Conditional requests remember each response's ETag and send ``If-None-Match`` next time; a
+    304, which does not count against GitHub's quota, is answered from the stored body.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, max_concurrency: int = 8, max_retries: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 30.0, max_wait: float = 60.0, low_water: int = 100,
+                 etag_cache_bytes: int = 32 * 1024 * 1024):
+        self.session = session or requests.Session()
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        self.low_water = low_water
+        self.etag_cache_bytes = etag_cache_bytes
+        self._counts = {"requests": 0, "retries": 0, "not_modified": 0, "throttled": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._etags = OrderedDict()
+        self._etag_bytes = 0
+
+    def _host(self, url: str) -> HostLimit:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostLimit(self.max_concurrency)
+            return self._hosts[host]
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += amount
+
+    def count_bytes(self, amount: int) -> None:
+        """Record body bytes read from a ``stream=True`` response, which get() cannot see."""
+        self._count("bytes", amount)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def _quota_cap(self, limit: HostLimit) -> int:
+        if limit.remaining is None or limit.remaining >= self.low_water:
+            return self.max_concurrency
+        return max(1, self.max_concurrency * limit.remaining // self.low_water)
+
+    def _observe(self, limit: HostLimit, response: requests.Response, throttled: bool) -> None:
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        with limit.condition:
+            if remaining is not None and remaining.isdigit():
+                limit.remaining = int(remaining)
+            if reset is not None and reset.isdigit():
+                limit.reset_at = int(reset)
+            if throttled:
+                limit.limit = max(1, limit.limit // 2)
+            else:
+                limit.limit = min(limit.limit + 1, self._quota_cap(limit))
+            limit.condition.notify_all()
+
+    def _wait_for_quota(self, limit: HostLimit, url: str, max_wait: float) -> None:
+        with limit.condition:
+            if limit.remaining != 0 or limit.reset_at is None:
+                return
+            delay = limit.reset_at - time.time()
+        if delay > max_wait:
+            raise RateLimitExceeded(f"API rate limit exceeded for {urlsplit(url).netloc}; it resets in {int(delay)}s")
+        if delay > 0:
+            time.sleep(delay + random.uniform(0, self.backoff))
+        with limit.condition:
+            # Whoever wakes first sends the probe that refreshes the quota
+            if limit.reset_at is not None and limit.reset_at <= time.time():
+                limit.remaining = None
+
+    def _retry_delay(self, response: Optional[requests.Response], attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the outcome should be returned as is."""
+        if response is not None:
+            throttled = is_throttled(response)
+            if response.status_code not in RETRY_STATUSES and not throttled:
+                return None
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None and retry_after.isdigit():
+                delay = float(retry_after)
+            elif throttled and response.headers.get('X-RateLimit-Remaining') == '0':
+                reset = response.headers.get('X-RateLimit-Reset')
+                delay = int(reset) - time.time() if reset is not None and reset.isdigit() else self.max_backoff
+            else:
+                delay = None
+            if delay is not None:
+                return delay + random.uniform(0, self.backoff) if delay <= self.max_wait else None
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _remember(self, url: str, response: requests.Response) -> None:
+        etag = response.headers.get('ETag')
+        if not etag or len(response.content) > self.etag_cache_bytes:
+            return
+        with self._lock:
+            previous = self._etags.pop(url, None)
+            if previous is not None:
+                self._etag_bytes -= len(previous[1])
+            self._etags[url] = (etag, response.content, dict(response.headers))
+            self._etag_bytes += len(response.content)
+            while self._etag_bytes > self.etag_cache_bytes:
+                _, (_, content, _) = self._etags.popitem(last=False)
+                self._etag_bytes -= len(content)
+
+    def _stored(self, url: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._etags.get(url)
+            if entry is not None:
+                self._etags.move_to_end(url)
+            return entry
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, conditional: bool = False, retry: bool = True, **kwargs) -> requests.Response:
+        """GET `url` through the scheduler; `conditional` revalidates a stored copy with its ETag.
+
+        With ``retry=False`` the request is sent at most once and the scheduler never makes it wait:
+        a spent quota raises RateLimitExceeded at once, and a full concurrency window raises
+        requests.Timeout after the request's own `timeout`.
+        """
+        max_retries = self.max_retries if retry else 0
+        headers = dict(headers or {})
+        stored = self._stored(url) if conditional else None
+        if stored is not None:
+            headers['If-None-Match'] = stored[0]
+        limit = self._host(url)
+
+        attempt = 0
+        while True:
+            self._wait_for_quota(limit, url, self.max_wait if retry else 0.0)
+            if not limit.acquire(None if retry else kwargs.get('timeout')):
+                raise requests.Timeout(f"No free connection to {urlsplit(url).netloc}")
+            started = time.perf_counter()
+            try:
+                self._count("requests")
+                response = self.session.get(url, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.emit("request", time.perf_counter() - started, host=urlsplit(url).netloc, status=type(e).__name__, retry=attempt > 0)
+                if attempt >= max_retries:
+                    raise
+                response = None
+            finally:
+                limit.release()
+
+            if response is not None:
+                throttled = is_throttled(response)
+                if throttled:
+                    self._count("throttled")
+                self._observe(limit, response, throttled)
+                if metrics.enabled():
+                    metrics.emit("request", time.perf_counter() - started, host=urlsplit(url).netloc, status=response.status_code,
+                                 retry=attempt > 0, remaining=limit.remaining,
+                                 bytes_in=None if kwargs.get('stream') else len(response.content))
+            delay = self._retry_delay(response, attempt) if attempt < max_retries else None
+            if delay is None:
+                break
+            if response is not None:
+                response.close()
+            self._count("retries")
+            attempt += 1
+            time.sleep(max(0.0, delay))
+
+        if not kwargs.get('stream'):
+            self._count("bytes", len(response.content))
+        if stored is not None and response.status_code == 304:
+            self._count("not_modified")
+            return stored_response(url, stored)
+        if conditional and response.status_code == 200:
+            self._remember(url, response)
+        return response
+
+def is_throttled(response: requests.Response) -> bool:
+    """Whether the response is a primary or secondary rate-limit rejection rather than a real error."""
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and (
+        response.headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in response.headers
+    )
+
+def stored_response(url: str, stored: tuple) -> requests.Response:
+    _, content, headers = stored
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
@@ -37,7 +37,7 @@ function toggleMode() {
 
 async function processRepo() {
     const repoUrl = document.getElementById('repoUrl').value;
-    await processContent('/process', { repo_url: repoUrl });
+    await processContent('/jobs', { repo_url: repoUrl });
 }
 
 async function processFiles() {
@@ -50,7 +50,61 @@ async function processFiles() {
     for (let file of files) {
         formData.append('files[]', file);
     }
-    await processContent('/process', formData, false);
+    await processContent('/jobs', formData, false);
+}
+
+async function readNdjson(response, onMessage) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+        let newline;
+        while ((newline = buffered.indexOf('\n')) >= 0) {
+            const line = buffered.slice(0, newline);
+            buffered = buffered.slice(newline + 1);
+            if (line.trim() && onMessage(JSON.parse(line)) === false) {
+                await reader.cancel();
+                return false;
+            }
+        }
+        if (done) {
+            return true;
+        }
+    }
+}
+
+function showProgress(progress) {
+    const label = document.getElementById('progress');
+    if (!progress) {
+        label.textContent = '';
+        return;
+    }
+    const total = progress.files_total === null ? '?' : progress.files_total;
+    label.textContent = `${progress.files_done} of ${total} files, ${(progress.bytes / 1024).toFixed(0)} KB`;
+}
+
+function renderFilePreview(file) {
+    const fileContainer = document.createElement('div');
+    fileContainer.className = 'file-preview';
+
+    const fileName = document.createElement('div');
+    fileName.className = 'file-name';
+    fileName.textContent = file.filename;
+    fileContainer.appendChild(fileName);
+
+    const codeBlock = document.createElement('pre');
+    codeBlock.className = 'code-block hljs';
+    const code = document.createElement('code');
+    code.className = file.is_binary ? 'language-binary' : `language-${file.language}`;
+    code.textContent = file.content;
+    codeBlock.appendChild(code);
+    fileContainer.appendChild(codeBlock);
+    if (!file.is_binary) {
+        hljs.highlightElement(code);
+    }
+    return fileContainer;
 }
 
 async function processContent(url, data, isJson = true) {
@@ -67,51 +121,63 @@ async function processContent(url, data, isJson = true) {
                 body: JSON.stringify(data)
             } : { body: data })
         };
-        const response = await fetch(url, options);
-        const result = await response.json();
-
-        if (result.error) {
-            alert(result.error);
+        // The build runs as a background job; its events are streamed back as NDJSON
+        const submitted = await fetch(url, options);
+        const job = await submitted.json();
+        if (!submitted.ok) {
+            alert(job.error || 'An error occurred.');
+            return;
+        }
+        const response = await fetch(`/jobs/${job.job_id}/events`);
+        if (!(response.headers.get('Content-Type') || '').includes('application/x-ndjson')) {
+            const result = await response.json();
+            alert(result.error || 'An error occurred.');
             return;
         }
 
-        currentMarkdown = result.markdown;
-        currentFilename = result.filename;
-        document.getElementById('markdownOutput').value = result.markdown;
-
-        // Render individual file blocks
+        // Render file blocks as the server streams them in
         const output = document.getElementById('output');
+        const markdownOutput = document.getElementById('markdownOutput');
+        const chunks = [];
+        let fileCount = 0;
         output.innerHTML = '';
-        if (result.files && result.files.length > 0) {
-            result.files.forEach(file => {
-                const fileContainer = document.createElement('div');
-                fileContainer.className = 'file-preview';
-
-                const fileName = document.createElement('div');
-                fileName.className = 'file-name';
-                fileName.textContent = file.filename;
-                fileContainer.appendChild(fileName);
-
-                const codeBlock = document.createElement('pre');
-                codeBlock.className = 'code-block hljs';
-                const code = document.createElement('code');
-                code.className = file.is_binary ? 'language-binary' : `language-${file.language}`;
-                code.textContent = file.content;
-                codeBlock.appendChild(code);
-                fileContainer.appendChild(codeBlock);
-                if (!file.is_binary) {
-                    hljs.highlightElement(code);
-                }
-
-                output.appendChild(fileContainer);
+        markdownOutput.value = '';
+
+        const completed = await readNdjson(response, message => {
+            if (message.error) {
+                alert(message.error);
+                return false;
+            }
+            if (message.filename) {
+                currentFilename = message.filename;
+                return true;
+            }
+            if (message.progress) {
+                showProgress(message.progress);
+                return true;
+            }
+            if (message.done) {
+                return true;
+            }
+            chunks.push(message.markdown);
+            message.files.forEach(file => {
+                output.appendChild(renderFilePreview(file));
+                fileCount++;
             });
-        } else {
+            return true;
+        });
+        if (!completed) {
+            return;
+        }
+
+        currentMarkdown = chunks.join('');
+        markdownOutput.value = currentMarkdown;
+        if (fileCount === 0) {
             output.innerHTML = '<p>No files found in the Markdown.</p>';
         }
 
         document.getElementById('downloadBtn').style.display = 'inline-block';
 
-        const markdownOutput = document.getElementById('markdownOutput');
         markdownOutput.classList.add('fade-in');
         output.classList.add('fade-in');
         setTimeout(() => {
@@ -130,6 +196,7 @@ async function processContent(url, data, isJson = true) {
         alert('An error occurred: ' + error.message);
     } finally {
         spinner.style.display = 'none';
+        showProgress(null);
         buttons.forEach(btn => btn.disabled = false);
     }
 }
@@ -249,12 +316,46 @@ async function reverseProcess() {
     }
 }
 
+// Extracted files arrive without their content, which is fetched once a file scrolls into view
+const extractedContentObserver = new IntersectionObserver(entries => {
+    for (const entry of entries) {
+        if (entry.isIntersecting) {
+            extractedContentObserver.unobserve(entry.target);
+            loadExtractedContent(entry.target);
+        }
+    }
+}, { rootMargin: '200px' });
+
+async function fetchStoredFile(filepath) {
+    const response = await fetch('/download_file', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filepath: filepath })
+    });
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.error || 'An error occurred during download.');
+    }
+    return response;
+}
+
+async function loadExtractedContent(code) {
+    try {
+        const response = await fetchStoredFile(code.dataset.filepath);
+        code.textContent = await response.text();
+        hljs.highlightElement(code);
+    } catch (error) {
+        code.textContent = `Could not load file: ${error.message}`;
+    }
+}
+
 function displayExtractedFiles(files) {
     const filesDisplay = document.getElementById('filesDisplay');
     if (!filesDisplay) {
         console.error('filesDisplay element not found');
         return;
     }
+    extractedContentObserver.disconnect();
     filesDisplay.innerHTML = '';
 
     if (!files || files.length === 0) {
@@ -277,10 +378,11 @@ function displayExtractedFiles(files) {
             const code = document.createElement('code');
             const fileExtension = file.filename.split('.').pop().toLowerCase();
             code.className = `language-${fileExtension}`;
-            code.textContent = file.content;
+            code.textContent = `Loading ${file.size} bytes...`;
+            code.dataset.filepath = file.filepath;
             codeBlock.appendChild(code);
             fileContainer.appendChild(codeBlock);
-            hljs.highlightElement(code);
+            extractedContentObserver.observe(code);
         } else {
             const codeBlock = document.createElement('pre');
             codeBlock.className = 'code-block hljs';
@@ -312,18 +414,7 @@ function displayExtractedFiles(files) {
 
 async function downloadSingleFile(filepath, filename) {
     try {
-        const response = await fetch('/download_file', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ filepath: filepath })
-        });
-
-        if (!response.ok) {
-            const errorData = await response.json();
-            alert(errorData.error || 'An error occurred during download.');
-            return;
-        }
-
+        const response = await fetchStoredFile(filepath);
         const blob = await response.blob();
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
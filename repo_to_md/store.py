@@ -0,0 +1,205 @@
+import io
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+COPY_CHUNK_BYTES = 64 * 1024
+
+class StoredFile:
+    __slots__ = ('size', 'data', 'path')
+
+    def __init__(self, size: int, data: Optional[bytes] = None, path: Optional[Path] = None):
+        self.size = size
+        self.data = data
+        self.path = path
+
+class ReverseStore:
+    """Files extracted by reverse conversion, kept per browser session within a memory budget.
+
+    Files over `spill_bytes` are written straight to a temporary directory, and once the files
+    held in memory across all sessions pass `max_memory_bytes` the least recently used are moved
+    there too. Sessions idle for `ttl` seconds are dropped along with their spilled files, as
+    are the least recently used ones beyond `max_sessions`.
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None, max_memory_bytes: int = 64 * 1024 * 1024,
+                 spill_bytes: int = 1024 * 1024, ttl: float = 1800.0, max_sessions: int = 256):
+        self.directory = Path(directory or tempfile.mkdtemp(prefix="repo_to_md-reverse-"))
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_bytes = spill_bytes
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._last_used = {}
+        self._in_memory = OrderedDict()
+        self._memory_bytes = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def _spill_path(self, session_id: str) -> Path:
+        session_dir = self.directory / session_id
+        session_dir.mkdir(parents=True, exist_ok=True)
+        return session_dir / uuid.uuid4().hex
+
+    def _drop_session(self, session_id: str) -> None:
+        files = self._sessions.pop(session_id, {})
+        self._last_used.pop(session_id, None)
+        for filepath, entry in files.items():
+            if entry.data is not None:
+                del self._in_memory[(session_id, filepath)]
+                self._memory_bytes -= entry.size
+        shutil.rmtree(self.directory / session_id, ignore_errors=True)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for session_id in [session_id for session_id, used in self._last_used.items() if used < cutoff]:
+            self._drop_session(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._drop_session(next(iter(self._sessions)))
+
+    def _touch(self, session_id: str) -> Optional[Dict[str, StoredFile]]:
+        self._expire()
+        files = self._sessions.get(session_id)
+        if files is not None:
+            self._sessions.move_to_end(session_id)
+            self._last_used[session_id] = time.time()
+        return files
+
+    def _evict_to_disk(self) -> None:
+        while self._memory_bytes > self.max_memory_bytes and self._in_memory:
+            (session_id, _), entry = self._in_memory.popitem(last=False)
+            entry.path = self._spill_path(session_id)
+            entry.path.write_bytes(entry.data)
+            entry.data = None
+            self._memory_bytes -= entry.size
+
+    def replace(self, session_id: str, files: Iterable[Tuple[str, bytes]]) -> int:
+        """Replace everything stored for `session_id` with `files`; returns how many were stored."""
+        with self._lock:
+            self._drop_session(session_id)
+            files_stored = self._sessions[session_id] = {}
+            self._last_used[session_id] = time.time()
+            self._expire()
+        count = 0
+        for filepath, content in files:
+            # Large files are written before taking the lock so other sessions are not held up
+            path = None
+            if len(content) > self.spill_bytes:
+                path = self._spill_path(session_id)
+                path.write_bytes(content)
+            with self._lock:
+                stored = self._sessions.get(session_id)
+                if stored is not files_stored:
+                    # Expired or replaced meanwhile; the drop may have removed the spilled file already
+                    if path is not None:
+                        path.unlink(missing_ok=True)
+                    break
+                previous = stored.pop(filepath, None)
+                if previous is not None and previous.data is not None:
+                    del self._in_memory[(session_id, filepath)]
+                    self._memory_bytes -= previous.size
+                if path is not None:
+                    stored[filepath] = StoredFile(len(content), path=path)
+                else:
+                    stored[filepath] = StoredFile(len(content), data=content)
+                    self._in_memory[(session_id, filepath)] = stored[filepath]
+                    self._memory_bytes += len(content)
+                    self._evict_to_disk()
+            count += 1
+        return count
+
+    def filepaths(self, session_id: str) -> List[str]:
+        with self._lock:
+            files = self._touch(session_id)
+            return list(files) if files else []
+
+    def contains(self, session_id: str, filepath: str) -> bool:
+        with self._lock:
+            files = self._touch(session_id)
+            return bool(files) and filepath in files
+
+    def open(self, session_id: str, filepath: str) -> Optional[BinaryIO]:
+        """Open a stored file for reading, or return None if it is not (or no longer) stored."""
+        with self._lock:
+            files = self._touch(session_id)
+            entry = files.get(filepath) if files else None
+            if entry is None:
+                return None
+            if entry.data is not None:
+                self._in_memory.move_to_end((session_id, filepath))
+                return io.BytesIO(entry.data)
+            path = entry.path
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+    def view(self, session_id: str) -> "SessionFiles":
+        return SessionFiles(self, session_id)
+
+class SessionFiles(Mapping):
+    """Read-only mapping of file path to content bytes over one session's stored files."""
+
+    def __init__(self, store: ReverseStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    def __getitem__(self, filepath: str) -> bytes:
+        stored = self.store.open(self.session_id, filepath)
+        if stored is None:
+            raise KeyError(filepath)
+        with stored:
+            return stored.read()
+
+    def __contains__(self, filepath: object) -> bool:
+        # Checked against the file list, without reading the file as Mapping's default would
+        return isinstance(filepath, str) and self.store.contains(self.session_id, filepath)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.filepaths(self.session_id))
+
+    def __len__(self) -> int:
+        return len(self.store.filepaths(self.session_id))
+
+class ZipStream(io.RawIOBase):
+    """Write-only sink collecting what zipfile writes, to be drained chunk by chunk."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        chunks, self.chunks = self.chunks, []
+        return b"".join(chunks)
+
+def iter_zip(files: Iterable[Tuple[str, BinaryIO]]) -> Iterator[bytes]:
+    """Stream a deflated zip archive of (name, readable file) pairs without holding it in memory."""
+    sink = ZipStream()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, source in files:
+            with source, archive.open(name, 'w') as target:
+                for block in iter(lambda: source.read(COPY_CHUNK_BYTES), b''):
+                    target.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
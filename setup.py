@@ -18,6 +18,9 @@ setup(
         "requests",
         "huggingface_hub",
     ],
+    entry_points={
+        "console_scripts": ["repo_to_md=repo_to_md.cli:main"],
+    },
     extras_require={
         "demo": ["flask", "markdown"],  # Optional dependencies for demo
     },
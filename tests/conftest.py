@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from standin import StandInServer
+
+from repo_to_md import core
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start a stand-in serving the given files and point the GitHub URLs at it."""
+    servers = []
+
+    def serve(files):
+        server = StandInServer(dict(sorted(files.items()))).start()
+        servers.append(server)
+        monkeypatch.setattr(core, "GITHUB_API", f"{server.base_url}/repos/")
+        monkeypatch.setattr(core, "GITHUB_RAW_URL", f"{server.base_url}/raw/")
+        return server
+
+    yield serve
+    for server in servers:
+        server.stop()
@@ -0,0 +1,84 @@
+"""Archive mode must produce the same document as fetching file by file.
+
+Both modes run against the local stand-in from benchmarks/standin.py, which serves the listing,
+raw files and tarball of one fixture repository.
+"""
+import pytest
+
+from standin import build_tarball
+from synthetic import PROFILES, generate_repo
+
+from repo_to_md import core
+
+URL = "https://github.com/fixture/repo"
+
+# Git tree order puts "-notes.txt" and ".github/" ahead of the .gitignore that excludes them,
+# so the archive stream reaches them before the .gitignore itself
+LATE_IGNORED = {
+    "-notes.txt": b"n" * 4000,
+    ".github/workflow.yml": b"w" * 4000,
+    ".gitignore": b"-notes.txt\n.github/\nbuild/\n",
+    "README.md": b"# Fixture\n" + b"r" * 3000,
+    "build/out.js": b"ignored\n",
+    "src/main.py": b"print('main')\n" * 200,
+    "src/data.json": b'{"a": [1, 2, 3]}',
+    "src/logo.png": b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4,
+}
+
+def build_both(**options):
+    per_file = core.create_markdown_document(URL, **options)
+    archive = core.create_markdown_document(URL, archive=True, **options)
+    return per_file, archive
+
+def test_archive_matches_per_file(serve):
+    serve(generate_repo(PROFILES["small"], seed=3))
+    per_file, archive = build_both()
+    assert per_file.startswith("# Repository: fixture/repo\n")
+    assert archive == per_file
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"max_file_bytes": 1000},
+    {"max_total_bytes": 5000},
+    {"exclude": ["*.json"]},
+    {"use_gitignore": False},
+])
+def test_archive_matches_per_file_with_late_gitignore(serve, options):
+    serve(LATE_IGNORED)
+    per_file, archive = build_both(**options)
+    assert archive == per_file
+    if options.get("use_gitignore", True):
+        assert "-notes.txt" not in archive and ".github" not in archive
+
+def test_archive_budget_ignores_late_excluded_files(serve):
+    serve(LATE_IGNORED)
+    archive = core.create_markdown_document(URL, archive=True, max_total_bytes=5000)
+    # The excluded files streamed first would have used the whole budget
+    assert "### File: README.md\n```md\n# Fixture\n" in archive
+
+def test_archive_reports_progress(serve):
+    serve(LATE_IGNORED)
+    reports = []
+    document = "".join(core.iter_markdown_document(URL, archive=True, progress=lambda done, total: reports.append((done, total))))
+    kept = document.count("### File: ")
+    assert reports == [(done, kept) for done in range(1, kept + 1)]
+
+def test_archive_streams_after_the_tree(serve):
+    server = serve(LATE_IGNORED)
+    chunks = core.iter_markdown_document(URL, archive=True)
+    header = [next(chunks) for _ in range(4)]
+    assert header[0] == "# Repository: fixture/repo\n" and server.counts["tarball"] == 0
+    assert "".join(header + list(chunks)) == core.create_markdown_document(URL)
+    assert server.counts["tarball"] == 1
+
+@pytest.mark.parametrize("damage", ["missing member", "cut short"])
+def test_archive_falls_back_to_per_file(serve, damage):
+    server = serve(LATE_IGNORED)
+    if damage == "missing member":
+        tarball = build_tarball({path: content for path, content in LATE_IGNORED.items() if path != "src/data.json"})
+    else:
+        tarball = server.tarball()[:len(server.tarball()) // 2]
+    server.tarballs[server.head] = tarball
+    per_file, archive = build_both()
+    assert archive == per_file
+    assert '"a": [' in archive
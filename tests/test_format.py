@@ -0,0 +1,11 @@
+from repo_to_md import core
+
+def test_truncation_inside_a_character_is_still_text():
+    content = ("// note\n" * 125 + "é" * 900).encode('utf-8')
+    section = core.format_file_entry("src/notes.rs", len(content), 1003, lambda limit: content[:limit])
+    assert section.startswith("### File: src/notes.rs\n```rs\n" + "// note\n" * 125 + "é\ufffd\n```")
+    assert section.endswith("[Note: File truncated to 1003 of 2800 bytes]\n\n")
+
+def test_invalid_utf8_is_binary_when_whole():
+    content = b"// \xe9\n" * 100
+    assert core.format_file_content("src/notes.rs", content) == "### File: src/notes.rs\n[Binary file - 500 bytes]\n\n"
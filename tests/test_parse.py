@@ -0,0 +1,39 @@
+"""Both document parsers must split a document into the same file sections."""
+import io
+
+import pytest
+
+from repo_to_md import core
+
+DOCUMENT = (
+    "# Repository: fixture/repo\n"
+    "### File: a.py\n```python\nprint('a')\n```\n\n"
+    "### File: notes.md\n```md\nA fence inside a file:\n```\nnot the end\n```\n\n"
+    "### File: big.txt\n```txt\nbig\n```\n[Note: File truncated]\n\n"
+    "### File: logo.png\n[Binary file - 12 bytes]\n\n"
+    "### File: b.py\n```python\nprint('b')\n```\n"
+)
+
+def both_parsers(text):
+    sections = list(core.iter_file_sections(text))
+    assert list(core.iter_streamed_sections(io.BytesIO(text.encode('utf-8')))) == sections
+    return sections
+
+def test_parsers_agree():
+    sections = both_parsers(DOCUMENT)
+    assert [section['filename'] for section in sections] == ["a.py", "notes.md", "big.txt", "logo.png", "b.py"]
+    assert sections[1]['content'] == "A fence inside a file:\n```\nnot the end"
+    assert sections[3]['is_binary'] and sections[3]['binary_size'] == "12"
+
+def test_crlf_document():
+    assert both_parsers(DOCUMENT.replace("\n", "\r\n")) == both_parsers(DOCUMENT)
+
+@pytest.mark.parametrize("spacing", ["", "\n\n", " \n", "\t\n\n"])
+def test_blank_lines_after_fence(spacing):
+    text = DOCUMENT.replace("```\n\n### File:", f"```\n{spacing}### File:")
+    assert both_parsers(text) == both_parsers(DOCUMENT)
+
+@pytest.mark.parametrize("ending", ["", "\n", "\n\n \n"])
+def test_document_end_after_fence(ending):
+    sections = both_parsers(DOCUMENT.rstrip("\n") + ending)
+    assert sections[-1]['content'] == "print('b')"
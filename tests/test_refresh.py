@@ -0,0 +1,66 @@
+"""refresh_markdown_document must match a fresh build while fetching only what changed."""
+from synthetic import PROFILES, generate_repo
+
+from repo_to_md import core
+
+URL = "https://github.com/fixture/repo"
+
+def changed_repo(files):
+    paths = [path for path in files if path.startswith("dir") or path.startswith("file")]
+    changed = dict(files)
+    changed[paths[0]] = b"# edited\n"
+    changed["dir_new/added.py"] = b"print('added')\n"
+    del changed[paths[1]]
+    return changed, {paths[0], "dir_new/added.py"}
+
+def test_refresh_fetches_only_changed_files(serve):
+    files = generate_repo(PROFILES["small"], seed=5)
+    server = serve(files)
+    document, head = core.refresh_markdown_document(URL)
+    assert head == server.head and document == core.create_markdown_document(URL)
+
+    changed, fetched = changed_repo(files)
+    server.push(changed)
+    server.reset_counts()
+    refreshed, head = core.refresh_markdown_document(URL, document, head)
+    assert head == server.head
+    assert set(server.raw_counts) == fetched | {".gitignore"}
+    assert server.counts["compare"] == 1
+    assert refreshed == core.create_markdown_document(URL)
+
+def test_refresh_is_a_no_op_at_the_same_commit(serve):
+    server = serve(generate_repo(PROFILES["small"], seed=5))
+    document, head = core.refresh_markdown_document(URL)
+    server.reset_counts()
+    assert core.refresh_markdown_document(URL, document, head) == (document, head)
+    assert not server.raw_counts and not server.counts["compare"]
+
+def full_build(server):
+    """A fresh document and the raw files it fetched."""
+    server.reset_counts()
+    return core.create_markdown_document(URL), set(server.raw_counts)
+
+def test_refresh_rebuilds_after_force_push(serve):
+    files = generate_repo(PROFILES["small"], seed=5)
+    server = serve(files)
+    server.push({**files, "notes.md": b"# rewritten later\n"})
+    document, head = core.refresh_markdown_document(URL)
+    server.push(changed_repo(files)[0], force=True)
+    assert server.compare(head, server.head)["status"] == "diverged"
+
+    server.reset_counts()
+    refreshed, _ = core.refresh_markdown_document(URL, document, head)
+    fetched = set(server.raw_counts)
+    assert (refreshed, fetched) == full_build(server)
+
+def test_refresh_rebuilds_when_comparison_is_truncated(serve):
+    files = {f"src/file{index:03}.py": b"print(%d)\n" % index for index in range(400)}
+    server = serve(files)
+    document, head = core.refresh_markdown_document(URL)
+    server.push({path: content + b"# edited\n" if index < 310 else content for index, (path, content) in enumerate(files.items())})
+    server.reset_counts()
+    refreshed, _ = core.refresh_markdown_document(URL, document, head)
+    fetched = set(server.raw_counts)
+    assert len(server.compare(head, server.head)["files"]) == 300
+    assert len(fetched) == 400
+    assert (refreshed, fetched) == full_build(server)
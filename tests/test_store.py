@@ -0,0 +1,13 @@
+from repo_to_md.store import ReverseStore
+
+def test_replace_stops_when_replaced_meanwhile(tmp_path):
+    store = ReverseStore(tmp_path, spill_bytes=4)
+
+    def first():
+        yield "a1", b"one"
+        store.replace("session", [("b1", b"spilled")])
+        yield "a2", b"two is spilled"
+
+    assert store.replace("session", first()) == 1
+    assert store.filepaths("session") == ["b1"]
+    assert store.open("session", "b1").read() == b"spilled"